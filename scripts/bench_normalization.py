@@ -0,0 +1,247 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+from utils.normalization import NormalizationRules
+
+# =============================
+# SCRIPT: YAML NORMALIZATION BENCHMARK
+# =============================
+# Usage:
+#   python -m scripts.bench_normalization
+#
+# Builds a synthetic export corpus (charts with compact, pretty-printed and
+# multi-line query_context, wide datasets, dashboards with large position maps),
+# checks that the rule engine's output is byte-identical to the previous
+# multi-pass implementation (kept below as the baseline), then times both.
+
+# =============================
+# CONFIGURATION
+# =============================
+CHARTS = int(os.environ.get("SUPERSET_BENCH_CHARTS", "300"))
+DATASETS = int(os.environ.get("SUPERSET_BENCH_DATASETS", "100"))
+DATASET_COLUMNS = int(os.environ.get("SUPERSET_BENCH_COLUMNS", "200"))
+DASHBOARDS = int(os.environ.get("SUPERSET_BENCH_DASHBOARDS", "3"))
+POSITION_ENTRIES = int(os.environ.get("SUPERSET_BENCH_POSITIONS", "20000"))
+# Best of this many runs is reported
+REPEAT = int(os.environ.get("SUPERSET_BENCH_REPEAT", "3"))
+
+# =============================
+# BASELINE (multi-pass normalization before the rule engine)
+# =============================
+
+YAML_FIELDS_TO_REMOVE = [
+    r'^\s*annotation_layers:\s*\[\]\s*$',
+    r'^\s*adhoc_filters:\s*\[\]\s*$',
+    r'^\s*dashboards:\s*\[\]\s*$',
+    r'^\s*extra_form_data:\s*\{\}\s*$'
+]
+
+
+def deep_sort_json(obj):
+    """Recursively sort all keys in a JSON object for consistent ordering"""
+    if isinstance(obj, dict):
+        return {k: deep_sort_json(v) for k, v in sorted(obj.items())}
+    elif isinstance(obj, list):
+        return [deep_sort_json(item) for item in obj]
+    else:
+        return obj
+
+
+def baseline_normalize_json_block(json_lines):
+    json_text = '\n'.join(json_lines)
+    match = re.match(r'^(\s*query_context:\s*\'?)(.*?)(\'?\s*)$', json_text, re.DOTALL)
+    if not match:
+        return json_lines
+
+    prefix = match.group(1)
+    json_str = match.group(2)
+    suffix = match.group(3)
+
+    if json_str.endswith("'}'"):
+        json_str = json_str[:-2] + "}"
+    elif json_str.endswith("'}"):
+        json_str = json_str[:-1] + "}"
+
+    try:
+        json_obj = deep_sort_json(json.loads(json_str))
+        normalized_json = json.dumps(json_obj, separators=(',', ':'), sort_keys=True)
+    except json.JSONDecodeError:
+        return json_lines
+
+    return [prefix + normalized_json + suffix]
+
+
+def baseline_normalize_json_in_yaml(content):
+    lines = content.splitlines()
+    normalized_lines = []
+    i = 0
+
+    while i < len(lines):
+        line = lines[i]
+        if re.match(r'^\s*query_context:\s*\'?\{', line):
+            json_lines = [line]
+            if not re.search(r'\}\'?\s*$', line):
+                i += 1
+                while i < len(lines):
+                    current_line = lines[i]
+                    json_lines.append(current_line)
+                    if re.search(r'\}\'?\s*$', current_line):
+                        break
+                    i += 1
+            normalized_lines.extend(baseline_normalize_json_block(json_lines))
+        else:
+            normalized_lines.append(line)
+        i += 1
+
+    return '\n'.join(normalized_lines)
+
+
+def baseline_normalize_yaml_content(content):
+    if not content:
+        return content
+
+    normalized_lines = [line.rstrip() for line in content.splitlines()]
+
+    filtered_lines = []
+    for line in normalized_lines:
+        should_remove = False
+        for pattern in YAML_FIELDS_TO_REMOVE:
+            if re.match(pattern, line):
+                should_remove = True
+                break
+        if not should_remove:
+            filtered_lines.append(line)
+
+    normalized_content = baseline_normalize_json_in_yaml('\n'.join(filtered_lines))
+    normalized_content = re.sub(r'\n\s*\n\s*\n+', '\n\n', normalized_content)
+    normalized_content = normalized_content.rstrip('\n')
+    if normalized_content:
+        normalized_content += '\n'
+    return normalized_content
+
+# =============================
+# SYNTHETIC CORPUS
+# =============================
+
+def make_query_context(rng, chart_id):
+    return {
+        "datasource": {"id": rng.randint(1, DATASETS), "type": "table"},
+        "force": False,
+        "queries": [{
+            "filters": [{"col": f"col_{rng.randint(0, 50)}", "op": "IN", "val": ["a", "b"]}],
+            "extras": {"having": "", "where": ""},
+            "metrics": [{"label": f"SUM(m_{i})", "expressionType": "SQL"} for i in range(rng.randint(1, 5))],
+            "row_limit": 10000,
+        }],
+        "form_data": {"slice_id": chart_id, "viz_type": "table", "extra_form_data": {}},
+        "result_format": "json",
+    }
+
+
+def make_chart(rng, chart_id):
+    qc = make_query_context(rng, chart_id)
+    style = chart_id % 3
+    if style == 0:
+        query_context = f"query_context: '{json.dumps(qc)}'"
+    elif style == 1:
+        query_context = f"query_context: '{json.dumps(qc, separators=(',', ':'), sort_keys=True)}'"
+    else:
+        # Pretty-printed JSON spread over several lines
+        query_context = "query_context: '" + json.dumps(qc, indent=2).replace("\n", "\n  ") + "'"
+    return (
+        f"slice_name: Chart {chart_id}   \n"
+        f"description: null\n"
+        f"viz_type: table\n"
+        f"params:\n"
+        f"  adhoc_filters: []\n"
+        f"  annotation_layers: []\n"
+        f"  extra_form_data: {{}}\n"
+        f"  row_limit: 10000\n"
+        f"\n\n\n"
+        f"{query_context}\n"
+        f"cache_timeout: null\n"
+        f"uuid: {chart_id:08d}-0000-0000-0000-000000000000\n"
+        f"version: 1.0.0\n"
+        f"dataset_uuid: {rng.randint(1, DATASETS):08d}-0000-0000-0000-000000000000\n\n\n"
+    )
+
+
+def make_dataset(rng, dataset_id):
+    lines = [
+        f"table_name: table_{dataset_id}",
+        "main_dttm_col: null",
+        "dashboards: []",
+        "columns:",
+    ]
+    for i in range(DATASET_COLUMNS):
+        lines += [
+            f"- column_name: col_{i}  ",
+            "  verbose_name: null",
+            f"  is_dttm: {'true' if i % 17 == 0 else 'false'}",
+            f"  type: {rng.choice(['VARCHAR', 'BIGINT', 'DOUBLE', 'TIMESTAMP'])}",
+            "  extra: {}",
+            "",
+        ]
+    lines += [f"uuid: {dataset_id:08d}-0000-0000-0000-000000000000", "version: 1.0.0", ""]
+    return "\n".join(lines)
+
+
+def make_dashboard(rng, dashboard_id):
+    lines = [f"dashboard_title: Dashboard {dashboard_id}", "position:"]
+    for i in range(POSITION_ENTRIES):
+        lines += [
+            f"  CHART-{i}:",
+            "    children: []",
+            f"    id: CHART-{i}",
+            "    meta:",
+            f"      chartId: {rng.randint(1, CHARTS)}",
+            "      height: 50",
+            "      width: 4",
+            "    type: CHART",
+        ]
+    lines += ["metadata:", "  extra_form_data: {}", f"uuid: d{dashboard_id:07d}-0000-0000-0000-000000000000", ""]
+    return "\n".join(lines)
+
+
+def build_corpus(seed=0):
+    rng = random.Random(seed)
+    corpus = [make_chart(rng, i) for i in range(1, CHARTS + 1)]
+    corpus += [make_dataset(rng, i) for i in range(1, DATASETS + 1)]
+    corpus += [make_dashboard(rng, i) for i in range(1, DASHBOARDS + 1)]
+    return corpus
+
+
+def time_best(normalize, corpus):
+    best = None
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        for content in corpus:
+            normalize(content)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+# =============================
+# MAIN EXECUTION
+# =============================
+if __name__ == "__main__":
+    corpus = build_corpus()
+    total_mb = sum(len(content) for content in corpus) / (1024 * 1024)
+    print(f"--- {CHARTS} charts, {DATASETS} datasets, {DASHBOARDS} dashboards ({total_mb:.1f} MB) ---")
+
+    # Default rules, so SUPERSET_NORMALIZE_RULES doesn't skew the comparison
+    rules = NormalizationRules()
+
+    mismatches = [i for i, content in enumerate(corpus) if rules.normalize(content) != baseline_normalize_yaml_content(content)]
+    if mismatches:
+        print(f"❌ Rule engine output differs from the baseline for {len(mismatches)} document(s), e.g. #{mismatches[0]}")
+        sys.exit(1)
+    print("✅ Rule engine output is identical to the baseline")
+
+    baseline_time = time_best(baseline_normalize_yaml_content, corpus)
+    engine_time = time_best(rules.normalize, corpus)
+    print(f"⏱️ baseline    {baseline_time:.2f}s")
+    print(f"⏱️ rule engine {engine_time:.2f}s ({baseline_time / engine_time:.1f}x)")
@@ -0,0 +1,152 @@
+import os
+import sys
+import shutil
+import tempfile
+import zipfile
+
+# export.py reads its settings at import time
+os.environ["SUPERSET_LOW_MEMORY"] = "1"
+
+from scripts import export
+from utils.utils import get_peak_rss_mb
+
+# =============================
+# SCRIPT: LOW-MEMORY EXPORT RSS CHECK
+# =============================
+# Usage:
+#   python -m scripts.check_export_memory
+#
+# Feeds a large synthetic dashboard export zip through export_item (closure mode,
+# so a bundle is collected) with a stub session, twice: once into an empty folder
+# and once over the files of the first run (the compare path). Fails if the peak
+# RSS grows by more than the allowed headroom, i.e. if a member is held in memory.
+
+# =============================
+# CONFIGURATION
+# =============================
+# Uncompressed size of the synthetic dashboard member
+MEMBER_MB = int(os.environ.get("SUPERSET_CHECK_MEMBER_MB", "256"))
+# Allowed peak RSS growth over the baseline measured before the export
+HEADROOM_MB = int(os.environ.get("SUPERSET_CHECK_HEADROOM_MB", "64"))
+
+DASHBOARD_UUID = "d0000000-0000-0000-0000-000000000001"
+CHART_UUID = "c0000000-0000-0000-0000-000000000001"
+DATASET_UUID = "a0000000-0000-0000-0000-000000000001"
+DATABASE_UUID = "b0000000-0000-0000-0000-000000000001"
+
+# =============================
+# HELPER FUNCTIONS
+# =============================
+
+class StubResponse:
+    """Streams a zip file from disk like a requests response opened with stream=True"""
+
+    status_code = 200
+    text = ""
+
+    def __init__(self, path):
+        self.path = path
+        self.closed = False
+
+    def iter_content(self, chunk_size=1024 * 1024):
+        with open(self.path, "rb") as f:
+            while chunk := f.read(chunk_size):
+                yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class StubSession:
+    """Answers every export call with the same zip"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def get(self, url, **kwargs):
+        return StubResponse(self.path)
+
+
+def write_dashboard_member(zf, name, size_mb):
+    """Writes a dashboard YAML of about size_mb MB to the zip, one line at a time"""
+    with zf.open(name, "w") as dst:
+        dst.write(
+            f"dashboard_title: Memory check\nuuid: {DASHBOARD_UUID}\nversion: 1.0.0\nposition:\n".encode("utf-8")
+        )
+        written, i = 0, 0
+        while written < size_mb * 1024 * 1024:
+            line = (
+                f"  CHART-{i:08d}:\n"
+                f"    children: []\n"
+                f"    id: CHART-{i:08d}\n"
+                f"    meta:\n"
+                f"      chartId: {i}\n"
+                f"      height: 50\n"
+                f"      uuid: {CHART_UUID}\n"
+                f"      width: 4\n"
+                f"    type: CHART\n"
+            ).encode("utf-8")
+            dst.write(line)
+            written += len(line)
+            i += 1
+
+
+def build_export_zip(path, size_mb):
+    """Builds a dashboard export zip shaped like Superset's (one top-level folder)"""
+    top = "dashboard_export_20240101T000000"
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr(f"{top}/metadata.yaml", "version: 1.0.0\ntype: Dashboard\n")
+        write_dashboard_member(zf, f"{top}/dashboards/Memory_check_1.yaml", size_mb)
+        zf.writestr(
+            f"{top}/charts/Chart_1.yaml",
+            f"slice_name: Chart\nuuid: {CHART_UUID}\ndataset_uuid: {DATASET_UUID}\nversion: 1.0.0\n",
+        )
+        zf.writestr(
+            f"{top}/datasets/db/table.yaml",
+            f"table_name: table\nuuid: {DATASET_UUID}\ndatabase_uuid: {DATABASE_UUID}\nversion: 1.0.0\n",
+        )
+        zf.writestr(
+            f"{top}/databases/db.yaml",
+            f"database_name: db\nuuid: {DATABASE_UUID}\nversion: 1.0.0\n",
+        )
+
+
+# =============================
+# MAIN EXECUTION
+# =============================
+if __name__ == "__main__":
+    work_dir = tempfile.mkdtemp(prefix="superset_memcheck_")
+    try:
+        zip_path = os.path.join(work_dir, "export.zip")
+        build_export_zip(zip_path, MEMBER_MB)
+        output_dir = os.path.join(work_dir, "superset_exports", "dashboards")
+        session = StubSession(zip_path)
+
+        baseline = get_peak_rss_mb()
+        if baseline is None:
+            print("🟠 Peak RSS is not available on this platform, nothing to check")
+            exit()
+        print(f"--- {MEMBER_MB} MB dashboard member, baseline peak RSS {baseline:.1f} MB ---")
+
+        bundles = []
+        for _ in range(2):
+            bundle = {}
+            if not export.export_item(session, "http://stub", "dashboard", 1, output_dir, "Memory check", bundle):
+                print("❌ Export failed")
+                sys.exit(1)
+            bundles.append(bundle)
+
+        peak = get_peak_rss_mb()
+        ceiling = baseline + HEADROOM_MB
+        print(f"📈 Peak RSS {peak:.1f} MB (ceiling {ceiling:.1f} MB)")
+
+        expected = {"charts/Chart_1.yaml", "datasets/db/table.yaml", "databases/db.yaml"}
+        if any(set(bundle) != expected for bundle in bundles):
+            print(f"❌ Closure bundle should hold {sorted(expected)}, got {[sorted(b) for b in bundles]}")
+            sys.exit(1)
+        if peak > ceiling:
+            print(f"❌ Peak RSS grew by {peak - baseline:.1f} MB, more than {HEADROOM_MB} MB")
+            sys.exit(1)
+        print("✅ Low-memory export stays under the ceiling")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -1,8 +1,18 @@
 import os
 import zipfile
 import io
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from urllib.parse import quote_plus
-from utils.utils import login_superset, normalize_yaml_content
+from utils.utils import (
+    login_superset, get_superset_items, normalize_yaml_content, normalized_digest, get_peak_rss_mb
+)
+from utils.dependencies import DependencyIndex, bundle_member_type, split_bundle_by_owner
+from utils.layout import get_layout, layout_for_type_dir
+from utils.adaptive import ENDPOINT_LIMITS
+from utils.normalization import get_normalization_cache
+from utils.profiling import start_profiling
 
 # =============================
 # SCRIPT: UNIVERSAL SUPERSET EXPORT
@@ -17,35 +27,247 @@ OUTPUT_BASE_DIR = "./superset_exports"
 
 IGNORE_FILES = ["metadata.yaml"]
 
+# --- SELECTIVE EXPORT (optional, leave unset to export everything) ---
+# SUPERSET_EXPORT_TYPES="dashboard,chart"       only export these object types
+# SUPERSET_EXPORT_IDS="dashboard:9,chart:42"    only export these object ids
+# SUPERSET_EXPORT_TAG="finance"                 only export objects carrying this tag
+# SUPERSET_EXPORT_OWNER="3"                     only export objects owned by this user id
+# SUPERSET_EXPORT_DASHBOARD="9,12"              export these dashboards plus their charts and datasets
+EXPORT_TYPES = os.environ.get("SUPERSET_EXPORT_TYPES", "")
+EXPORT_IDS = os.environ.get("SUPERSET_EXPORT_IDS", "")
+EXPORT_TAG = os.environ.get("SUPERSET_EXPORT_TAG", "")
+EXPORT_OWNER = os.environ.get("SUPERSET_EXPORT_OWNER", "")
+EXPORT_DASHBOARD = os.environ.get("SUPERSET_EXPORT_DASHBOARD", "")
+
+# SUPERSET_EXPORT_CLOSURE=1 exports dashboards first and refreshes the charts and
+# datasets they contain from the dashboard bundle, so each object is exported once
+EXPORT_CLOSURE = os.environ.get("SUPERSET_EXPORT_CLOSURE", "0") == "1"
+
+# --- CONCURRENCY ---
+# SUPERSET_ADAPTIVE=1 paces list/export calls to what the instance sustains (AIMD)
+ADAPTIVE = os.environ.get("SUPERSET_ADAPTIVE", "0") == "1"
+# SUPERSET_EXPORT_WORKERS exports this many objects in parallel. In adaptive mode it
+# defaults to the export limiter's maximum and the limiter paces the workers
+EXPORT_WORKERS = int(
+    os.environ.get("SUPERSET_EXPORT_WORKERS") or (ENDPOINT_LIMITS["export"][1] if ADAPTIVE else 1)
+)
+
+# --- MEMORY ---
+# SUPERSET_LOW_MEMORY=1 spools each export zip to a temp file and compares/writes one
+# member at a time with streaming normalization, instead of holding it all in memory
+# (`python -m scripts.check_export_memory` checks this against a large synthetic zip)
+LOW_MEMORY = os.environ.get("SUPERSET_LOW_MEMORY", "0") == "1"
+# SUPERSET_MAX_RSS_MB fails the run if peak memory goes above this ceiling (0 = no check)
+MAX_RSS_MB = float(os.environ.get("SUPERSET_MAX_RSS_MB", "0"))
+
+# Tag filter operator per endpoint (the dataset list API has no tag filter)
+TAG_FILTER_OPERATORS = {
+    "chart": "chart_tags",
+    "dashboard": "dashboard_tags",
+}
+
 # =============================
 # HELPER FUNCTIONS
 # =============================
 
-def get_superset_items(session, url, endpoint):
-    """Fetch items from Superset API with pagination"""
-    items = []
-    page = 0
-    page_size = 100
-    
-    print("\n===============")
-    print(f"\n📋 Fetching {endpoint} list from Superset...")
-    
-    while True:
-        resp = session.get(f"{url}/api/v1/{endpoint}/?q={{\"page\":{page},\"page_size\":{page_size}}}")
-        if resp.status_code != 200:
-            print(f"❌ Failed to fetch {endpoint}: {resp.status_code}")
-            return []
-        data = resp.json()
-        results = data.get("result", [])
-        items.extend(results)
-        if len(results) < page_size:
-            break
-        page += 1
-    print(f"✅ Total {endpoint} fetched: {len(items)}")
-    return items
-
-def export_item(session, url, endpoint, item_id, output_dir, item_name=None):
-    """Export a Superset item to JSON/zip"""
+def get_dashboard_dependencies(session, url, dashboard_id):
+    """Returns the ids of the charts and datasets a dashboard uses"""
+    chart_ids, dataset_ids = set(), set()
+
+    charts = get_superset_items(session, url, "chart", [
+        {"col": "dashboards", "opr": "rel_m_m", "value": dashboard_id}
+    ])
+    for chart in charts:
+        chart_ids.add(chart["id"])
+        if chart.get("datasource_id"):
+            dataset_ids.add(chart["datasource_id"])
+
+    resp = session.get(f"{url}/api/v1/dashboard/{dashboard_id}/datasets")
+    if resp.status_code == 200:
+        dataset_ids.update(d["id"] for d in resp.json().get("result", []))
+    else:
+        print(f"❌ Failed to fetch datasets of dashboard {dashboard_id}: {resp.status_code}")
+
+    return chart_ids, dataset_ids
+
+
+def parse_id_list(value):
+    """Parses "1, 2,3" into [1, 2, 3]"""
+    return [int(part) for part in value.split(",") if part.strip()]
+
+
+def check_endpoint(setting, endpoint, endpoints):
+    """Returns an error message if `endpoint` (from `setting`) isn't one of `endpoints`, else None"""
+    if endpoint in endpoints:
+        return None
+    hint = f" (did you mean '{endpoint[:-1]}'?)" if endpoint.endswith("s") and endpoint[:-1] in endpoints else ""
+    return f"{setting}: unknown type '{endpoint}'{hint}, expected one of {', '.join(endpoints)}"
+
+
+def parse_export_settings(endpoints):
+    """
+    Validates the SUPERSET_EXPORT_* settings.
+    Returns (selected types, {endpoint: set(ids)}, dashboard ids, owner id) or None,
+    after printing every problem found, if any setting is malformed.
+    """
+    errors = []
+
+    selected_types = [t.strip() for t in EXPORT_TYPES.split(",") if t.strip()] or list(endpoints)
+    errors.extend(filter(None, (check_endpoint("SUPERSET_EXPORT_TYPES", t, endpoints) for t in selected_types)))
+
+    selected_ids = {}
+    for entry in EXPORT_IDS.split(","):
+        if not entry.strip():
+            continue
+        endpoint, _, item_id = entry.strip().partition(":")
+        error = check_endpoint("SUPERSET_EXPORT_IDS", endpoint, endpoints)
+        if error:
+            errors.append(error)
+        elif not item_id.strip().isdigit():
+            errors.append(f"SUPERSET_EXPORT_IDS: '{entry.strip()}' is not <type>:<id> (e.g. chart:42)")
+        else:
+            selected_ids.setdefault(endpoint, set()).add(int(item_id))
+
+    try:
+        dashboard_ids = parse_id_list(EXPORT_DASHBOARD)
+    except ValueError:
+        errors.append(f"SUPERSET_EXPORT_DASHBOARD: '{EXPORT_DASHBOARD}' is not a list of dashboard ids")
+        dashboard_ids = []
+
+    owner_id = None
+    if EXPORT_OWNER:
+        if EXPORT_OWNER.strip().isdigit():
+            owner_id = int(EXPORT_OWNER)
+        else:
+            errors.append(f"SUPERSET_EXPORT_OWNER: '{EXPORT_OWNER}' is not a user id")
+
+    for error in errors:
+        print(f"❌ {error}")
+    if errors:
+        return None
+    return selected_types, selected_ids, dashboard_ids, owner_id
+
+
+def build_export_filters(session, url, endpoints):
+    """
+    Translates the SUPERSET_EXPORT_* settings into rison filters per endpoint.
+    Returns {endpoint: filters}; endpoints missing from the result are skipped.
+    An empty filter list means "export everything" for that endpoint.
+    Returns None if the settings are malformed.
+    """
+    settings = parse_export_settings(endpoints)
+    if settings is None:
+        return None
+    # Explicit ids, from SUPERSET_EXPORT_IDS and from the dashboard closure
+    selected_types, selected_ids, dashboard_ids, owner_id = settings
+
+    for dashboard_id in dashboard_ids:
+        chart_ids, dataset_ids = get_dashboard_dependencies(session, url, dashboard_id)
+        selected_ids.setdefault("dashboard", set()).add(dashboard_id)
+        selected_ids.setdefault("chart", set()).update(chart_ids)
+        selected_ids.setdefault("dataset", set()).update(dataset_ids)
+        print(f"🔗 Dashboard {dashboard_id}: {len(chart_ids)} chart(s), {len(dataset_ids)} dataset(s)")
+
+    export_filters = {}
+    for endpoint in endpoints:
+        if endpoint not in selected_types:
+            continue
+
+        filters = []
+        if selected_ids:
+            if not selected_ids.get(endpoint):
+                continue
+            filters.append({"col": "id", "opr": "in", "value": sorted(selected_ids[endpoint])})
+
+        if EXPORT_TAG:
+            if endpoint in TAG_FILTER_OPERATORS:
+                filters.append({"col": "tags", "opr": TAG_FILTER_OPERATORS[endpoint], "value": EXPORT_TAG})
+            elif not selected_ids.get(endpoint):
+                print(f"🟠 {endpoint} list can't be filtered by tag, skipping")
+                continue
+
+        if owner_id is not None:
+            filters.append({"col": "owners", "opr": "rel_m_m", "value": owner_id})
+
+        export_filters[endpoint] = filters
+
+    return export_filters
+
+
+def write_export_file(folder_path, filename_to_save, file_content):
+    """Writes one exported file into an object folder if its normalized content changed"""
+    file_path = os.path.join(folder_path, filename_to_save)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if os.path.basename(filename_to_save) in IGNORE_FILES and os.path.exists(file_path):
+        print(f"ℹ️ Ignored existing file: {filename_to_save}")
+        return False
+
+    # Normalize content for comparison to handle line break differences
+    normalized_new_content = normalize_yaml_content(file_content)
+    normalized_existing_content = ""
+    if os.path.exists(file_path):
+        normalized_existing_content = normalize_yaml_content(open(file_path).read())
+
+    if not os.path.exists(file_path) or normalized_existing_content != normalized_new_content:
+        with open(file_path, 'w') as f:
+            f.write(file_content)
+        print(f"✅ File updated: {filename_to_save}")
+        return True
+    return False
+
+def write_export_member(z, member, folder_path, filename_to_save):
+    """
+    Low-memory variant of write_export_file: compares normalized digests of the zip
+    member and the existing file line by line, then streams the member to disk.
+    """
+    file_path = os.path.join(folder_path, filename_to_save)
+    os.makedirs(os.path.dirname(file_path), exist_ok=True)
+
+    if os.path.basename(filename_to_save) in IGNORE_FILES and os.path.exists(file_path):
+        print(f"ℹ️ Ignored existing file: {filename_to_save}")
+        return False
+
+    if os.path.exists(file_path):
+        with z.open(member) as raw:
+            new_digest = normalized_digest(io.TextIOWrapper(raw, encoding="utf-8", newline=""))
+        with open(file_path) as f:
+            if normalized_digest(f) == new_digest:
+                return False
+
+    with z.open(member) as src, open(file_path, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    print(f"✅ File updated: {filename_to_save}")
+    return True
+
+def spool_response(resp, chunk_size=1024 * 1024):
+    """Streams a response body into an anonymous temp file and returns it rewound"""
+    spool = tempfile.TemporaryFile()
+    for chunk in resp.iter_content(chunk_size=chunk_size):
+        spool.write(chunk)
+    resp.close()
+    spool.seek(0)
+    return spool
+
+def export_closure_from_bundle(index, bundle, output_base_dir):
+    """
+    Writes the charts and datasets shipped inside a dashboard bundle into their
+    existing object folders. Returns the folders refreshed this way.
+    """
+    refreshed = set()
+    for folder, members in split_bundle_by_owner(index, bundle).items():
+        folder_path = get_layout(output_base_dir).folder_path(output_base_dir, folder)
+        updated_files = sum(write_export_file(folder_path, member, bundle[member]) for member in members)
+        print(f"🔗 {folder} refreshed from dashboard bundle ({updated_files} file(s) updated)")
+        refreshed.add(folder)
+    return refreshed
+
+def export_item(session, url, endpoint, item_id, output_dir, item_name=None, bundle=None):
+    """
+    Export a Superset item to JSON/zip.
+    If `bundle` is a dict, it is filled with {file path: content} of the exported zip
+    (in LOW_MEMORY mode, of its chart/dataset/database members only).
+    """
     display_name = item_name or f"{endpoint}_{item_id}"
     print(f"\n⬆️ Exporting {display_name}...")
 
@@ -53,16 +275,17 @@ def export_item(session, url, endpoint, item_id, output_dir, item_name=None):
     encoded_query = quote_plus(query_payload)
     export_url = f"{url}/api/v1/{endpoint}/export/?q={encoded_query}"
 
-    resp = session.get(export_url)
+    resp = session.get(export_url, stream=LOW_MEMORY)
     if resp.status_code != 200:
         print(f"❌ Failed to export {display_name}: {resp.text}")
         return False
 
-    folder_path = os.path.join(output_dir, f"{endpoint}_{item_id}")
+    folder_path = layout_for_type_dir(output_dir).object_dir(output_dir, f"{endpoint}_{item_id}")
     os.makedirs(folder_path, exist_ok=True)
     updated_files = 0
 
-    with zipfile.ZipFile(io.BytesIO(resp.content)) as z:
+    archive = spool_response(resp) if LOW_MEMORY else io.BytesIO(resp.content)
+    with archive, zipfile.ZipFile(archive) as z:
         top_level = None
         for name in z.namelist():
             if "/" in name:
@@ -76,26 +299,21 @@ def export_item(session, url, endpoint, item_id, output_dir, item_name=None):
             if not filename_to_save:
                 continue
 
-            file_path = os.path.join(folder_path, filename_to_save)
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-
-            if os.path.basename(filename_to_save) in IGNORE_FILES and os.path.exists(file_path):
-                print(f"ℹ️ Ignored existing file: {filename_to_save}")
+            if LOW_MEMORY:
+                # The closure split only needs the charts/datasets/databases of the
+                # bundle, so dashboard members are streamed and never held in memory
+                if bundle is not None and bundle_member_type(filename_to_save) not in (None, "dashboard"):
+                    bundle[filename_to_save] = z.read(filename).decode('utf-8')
+                if write_export_member(z, filename, folder_path, filename_to_save):
+                    updated_files += 1
                 continue
 
             file_content = z.read(filename).decode('utf-8')
-            
-            # Normalize content for comparison to handle line break differences
-            normalized_new_content = normalize_yaml_content(file_content)
-            normalized_existing_content = ""
-            if os.path.exists(file_path):
-                normalized_existing_content = normalize_yaml_content(open(file_path).read())
-            
-            if not os.path.exists(file_path) or normalized_existing_content != normalized_new_content:
-                with open(file_path, 'w') as f:
-                    f.write(file_content)
+            if bundle is not None:
+                bundle[filename_to_save] = file_content
+
+            if write_export_file(folder_path, filename_to_save, file_content):
                 updated_files += 1
-                print(f"✅ File updated: {filename_to_save}")
 
     if updated_files:
         print(f"✅ Updated {updated_files} file(s) for {display_name}")
@@ -107,13 +325,14 @@ def export_item(session, url, endpoint, item_id, output_dir, item_name=None):
 # MAIN EXECUTION
 # =============================
 if __name__ == "__main__":
+    start_profiling("export")  # opt-in: SUPERSET_PROFILE=1 or --profile
     os.makedirs(OUTPUT_BASE_DIR, exist_ok=True)
 
-    session = login_superset(LOCAL_URL, USERNAME, PASSWORD)
+    session = login_superset(LOCAL_URL, USERNAME, PASSWORD, pool_size=EXPORT_WORKERS, adaptive=ADAPTIVE)
     if not session:
         exit()
 
-    # Export order: databases -> datasets -> charts -> dashboards
+    # Export order: databases -> datasets -> charts -> dashboards (reversed in closure mode)
     items_sequence = [
         # ("database", "databases"),
         ("dataset", "datasets"),
@@ -121,10 +340,25 @@ if __name__ == "__main__":
         ("dashboard", "dashboards")
     ]
 
+    export_filters = build_export_filters(session, LOCAL_URL, [endpoint for endpoint, _ in items_sequence])
+    if export_filters is None:
+        exit(1)
+
+    # Closure mode: dashboards first, their bundles refresh the charts/datasets they contain
+    index = None
+    refreshed_folders = set()
+    if EXPORT_CLOSURE:
+        items_sequence.reverse()
+        index = DependencyIndex().load_exports_dir(OUTPUT_BASE_DIR)
+
     for endpoint, dir_name in items_sequence:
+        if endpoint not in export_filters:
+            print(f"\n🟠 Skipping {endpoint}s (not selected)")
+            continue
         output_dir = os.path.join(OUTPUT_BASE_DIR, dir_name)
         os.makedirs(output_dir, exist_ok=True)
-        items = get_superset_items(session, LOCAL_URL, endpoint)
+        items = get_superset_items(session, LOCAL_URL, endpoint, export_filters[endpoint])
+        jobs = []
         for item in items:
             # Determine human-readable name if available
             if endpoint == "database":
@@ -137,6 +371,43 @@ if __name__ == "__main__":
                 name = item.get("dashboard_title")
             else:
                 name = None
-            export_item(session, LOCAL_URL, endpoint, item['id'], output_dir, name)
+
+            if f"{dir_name}/{endpoint}_{item['id']}" in refreshed_folders:
+                print(f"🔗 {name or endpoint + '_' + str(item['id'])} already exported with its dashboard")
+                continue
+
+            bundle = {} if index is not None and endpoint == "dashboard" else None
+            jobs.append((item['id'], name, bundle))
+
+        def run_export(job):
+            item_id, name, bundle = job
+            export_item(session, LOCAL_URL, endpoint, item_id, output_dir, name, bundle)
+            return bundle
+
+        if EXPORT_WORKERS > 1:
+            # Dashboard bundles are written back to chart/dataset folders on this thread only
+            with ThreadPoolExecutor(max_workers=EXPORT_WORKERS) as executor:
+                futures = [executor.submit(run_export, job) for job in jobs]
+                for future in as_completed(futures):
+                    bundle = future.result()
+                    if bundle:
+                        refreshed_folders |= export_closure_from_bundle(index, bundle, OUTPUT_BASE_DIR)
+        else:
+            for job in jobs:
+                bundle = run_export(job)
+                if bundle:
+                    refreshed_folders |= export_closure_from_bundle(index, bundle, OUTPUT_BASE_DIR)
     
     print("\n--- Superset Universal Export Complete ---")
+    if ADAPTIVE:
+        print(f"🚦 Adaptive limits:\n{session.summary()}")
+    normalization_cache = get_normalization_cache()
+    if normalization_cache is not None:
+        print(f"🧮 Normalization cache: {normalization_cache.summary()}")
+
+    peak_rss_mb = get_peak_rss_mb()
+    if peak_rss_mb is not None:
+        print(f"📈 Peak memory: {peak_rss_mb:.1f} MB")
+        if MAX_RSS_MB and peak_rss_mb > MAX_RSS_MB:
+            print(f"❌ Peak memory above ceiling of {MAX_RSS_MB:.1f} MB")
+            exit(1)
@@ -1,5 +1,5 @@
 import os
-from utils.utils import login_superset, get_csrf_token, import_zip
+from utils.utils import login_superset, get_csrf_token, import_zip, import_zips_verified
 
 # =============================
 # CONFIGURATION
@@ -10,6 +10,10 @@ PASSWORD = os.environ.get("SUPERSET_ADMIN_PASS", "admin")
 
 OUTPUT_BASE_DIR = "./.tmp_zips"  # Folder containing exported zips
 
+# SUPERSET_VERIFY_IMPORT=1 checks imported objects on the target and retries mismatches
+VERIFY_IMPORT = os.environ.get("SUPERSET_VERIFY_IMPORT", "0") == "1"
+VERIFY_RETRIES = int(os.environ.get("SUPERSET_VERIFY_RETRIES", "1"))
+
 # =============================
 # HELPER FUNCTION
 # =============================
@@ -24,6 +28,14 @@ def import_zips_for_resource(session, url, resource_dir, resource_name):
         print(f"🟠 No {resource_name} zips found.")
         return
 
+    if VERIFY_IMPORT:
+        jobs = [(os.path.join(resource_dir, f), resource_name) for f in zip_files]
+        verified, failed = import_zips_verified(session, url, jobs, retries=VERIFY_RETRIES)
+        print(f"🔎 {resource_name.capitalize()} imports verified: {verified}")
+        if failed:
+            print(f"❌ {resource_name.capitalize()} imports not verified: {len(failed)}")
+        return
+
     for zip_file in zip_files:
         print(f"⬆️ Importing {resource_name}: {zip_file}")
         import_zip(session, url, os.path.join(resource_dir, zip_file), resource=resource_name)
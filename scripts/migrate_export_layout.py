@@ -0,0 +1,102 @@
+import os
+import sys
+from utils.layout import LAYOUTS, SHARD_RE, ExportLayout, get_layout, set_layout
+
+# =============================
+# SCRIPT: MIGRATE THE EXPORT DIRECTORY LAYOUT
+# =============================
+# Usage:
+#   python -m scripts.migrate_export_layout sharded [--dry-run]
+#       superset_exports/charts/chart_1/ -> superset_exports/charts/<shard>/chart_1/
+#   python -m scripts.migrate_export_layout flat [--dry-run]
+#       and back
+#
+# Folders are moved (not copied), so git sees the change as renames. Re-running
+# finishes an interrupted migration: folders already in place are left alone.
+
+# =============================
+# CONFIGURATION
+# =============================
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXPORTS_DIR = os.path.join(REPO_ROOT, "superset_exports")
+
+TYPE_DIRS = ["databases", "datasets", "charts", "dashboards"]
+
+# =============================
+# HELPER FUNCTIONS
+# =============================
+
+def find_object_dirs(type_path):
+    """
+    Yields (object folder, path) for every object folder in a type directory,
+    whether it sits flat or inside a shard (a partly migrated tree has both).
+    """
+    if not os.path.isdir(type_path):
+        return
+    with os.scandir(type_path) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            if SHARD_RE.match(entry.name):
+                with os.scandir(entry.path) as shard_entries:
+                    yield from ((e.name, e.path) for e in shard_entries if e.is_dir())
+            else:
+                yield entry.name, entry.path
+
+
+def migrate_type_dir(type_path, layout, dry_run=False):
+    """Moves every object folder of a type directory to its place in `layout`. Returns the number moved"""
+    moved = 0
+    for obj, current_path in sorted(find_object_dirs(type_path)):
+        target_path = layout.object_dir(type_path, obj)
+        if current_path == target_path:
+            continue
+        if os.path.exists(target_path):
+            print(f"❌ {obj}: {target_path} already exists, leaving {current_path} in place")
+            continue
+        if not dry_run:
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            os.rename(current_path, target_path)
+        moved += 1
+
+    # Shards emptied by a move back to flat
+    if not dry_run and os.path.isdir(type_path):
+        with os.scandir(type_path) as entries:
+            for entry in entries:
+                if entry.is_dir() and SHARD_RE.match(entry.name) and not os.listdir(entry.path):
+                    os.rmdir(entry.path)
+    return moved
+
+
+def migrate(exports_dir, layout_name, dry_run=False):
+    layout = ExportLayout(layout_name)
+    current = get_layout(exports_dir).name
+    print(f"--- Migrating {exports_dir} from {current} to {layout.name} layout{' (dry run)' if dry_run else ''} ---")
+
+    total = 0
+    for type_dir in TYPE_DIRS:
+        moved = migrate_type_dir(os.path.join(exports_dir, type_dir), layout, dry_run)
+        if moved:
+            print(f"📦 {type_dir}: {moved} folder(s) {'to move' if dry_run else 'moved'}")
+        total += moved
+
+    if not dry_run:
+        set_layout(exports_dir, layout.name)
+    print(f"✅ {total} folder(s) {'to move' if dry_run else 'moved'}")
+    if total and not dry_run:
+        print("📝 Commit the moves (git add -A superset_exports) so other clones switch layout too.")
+        print("   Syncs skip pure renames, so the commit doesn't re-import unchanged objects;")
+        print("   commit content changes separately so the moves stay exact renames.")
+
+
+# =============================
+# MAIN EXECUTION
+# =============================
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != "--dry-run"]
+    if len(args) != 1 or args[0] not in LAYOUTS:
+        print(f"Usage: python -m scripts.migrate_export_layout {'|'.join(LAYOUTS)} [--dry-run]")
+        exit(1)
+
+    os.makedirs(EXPORTS_DIR, exist_ok=True)
+    migrate(EXPORTS_DIR, args[0], dry_run="--dry-run" in sys.argv)
@@ -0,0 +1,127 @@
+import os
+import io
+import sys
+import zipfile
+from urllib.parse import quote_plus
+from utils.utils import login_superset, get_superset_items, get_csrf_token, import_zip
+from utils.snapshot import SnapshotWriter, SnapshotReader, iter_restore_batches
+from utils.layout import get_layout
+
+# =============================
+# SCRIPT: FULL-INSTANCE SNAPSHOT (BACKUP / RESTORE)
+# =============================
+# Usage:
+#   python -m scripts.snapshot create [snapshot.zip]           snapshot the live instance
+#   python -m scripts.snapshot create-from-repo [snapshot.zip] snapshot superset_exports/
+#   python -m scripts.snapshot restore [snapshot.zip] [uuid ...]
+#       restore everything, or only the given objects and what they depend on
+
+# =============================
+# CONFIGURATION
+# =============================
+SUPERSET_URL = os.environ.get("SUPERSET_URL", "http://localhost:8090")
+USERNAME = os.environ.get("SUPERSET_ADMIN_USER", "admin")
+PASSWORD = os.environ.get("SUPERSET_ADMIN_PASS", "admin")
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXPORTS_DIR = os.path.join(REPO_ROOT, "superset_exports")
+DEFAULT_SNAPSHOT = os.path.join(REPO_ROOT, "superset_snapshot.zip")
+
+# Objects per export call / per import bundle
+EXPORT_BATCH_SIZE = int(os.environ.get("SUPERSET_SNAPSHOT_EXPORT_BATCH", "50"))
+IMPORT_BATCH_SIZE = int(os.environ.get("SUPERSET_SNAPSHOT_IMPORT_BATCH", "50"))
+
+# Dashboards first: their bundles already hold most charts, datasets and databases
+EXPORT_SEQUENCE = ["dashboard", "chart", "dataset"]
+
+# =============================
+# HELPER FUNCTIONS
+# =============================
+
+def create_snapshot(session, url, snapshot_path):
+    """Exports every object in batches and stores the export bytes once per uuid"""
+    with SnapshotWriter(snapshot_path, source=url) as writer:
+        for endpoint in EXPORT_SEQUENCE:
+            ids = [item["id"] for item in get_superset_items(session, url, endpoint)]
+            for start in range(0, len(ids), EXPORT_BATCH_SIZE):
+                batch = ids[start:start + EXPORT_BATCH_SIZE]
+                query = quote_plus("!(" + ",".join(str(i) for i in batch) + ")")
+                resp = session.get(f"{url}/api/v1/{endpoint}/export/?q={query}")
+                if resp.status_code != 200:
+                    print(f"❌ Failed to export {endpoint}s {batch[0]}..{batch[-1]}: {resp.status_code}")
+                    continue
+                with zipfile.ZipFile(io.BytesIO(resp.content)) as export_zip:
+                    added = writer.add_export_zip(export_zip)
+                print(f"📦 {endpoint}s {start + 1}-{start + len(batch)}: {added} new object(s)")
+        total, duplicates = len(writer.toc["objects"]), writer.duplicates
+    print(f"✅ Snapshot written: {snapshot_path} ({total} objects, {duplicates} duplicate copies skipped)")
+
+
+def create_snapshot_from_repo(exports_dir, snapshot_path):
+    """Builds a snapshot from the object folders under superset_exports/"""
+    layout = get_layout(exports_dir)
+    with SnapshotWriter(snapshot_path, source=exports_dir) as writer:
+        # Datasets first: add_member keeps the first copy of a uuid, and an object's own
+        # folder is more current than the copies bundled with the charts/dashboards using it
+        for type_dir in ("datasets", "charts", "dashboards"):
+            type_path = os.path.join(exports_dir, type_dir)
+            for entry in sorted(layout.iter_objects(type_path), key=lambda e: e.name):
+                for root, _, files in os.walk(entry.path):
+                    for file_name in files:
+                        if not file_name.endswith(".yaml") or file_name == "metadata.yaml":
+                            continue
+                        full_path = os.path.join(root, file_name)
+                        member_path = os.path.relpath(full_path, entry.path).replace(os.sep, "/")
+                        with open(full_path, "rb") as f:
+                            writer.add_member(member_path, f.read())
+        total, duplicates = len(writer.toc["objects"]), writer.duplicates
+    print(f"✅ Snapshot written: {snapshot_path} ({total} objects, {duplicates} duplicate copies skipped)")
+
+
+def restore_snapshot(session, url, snapshot_path, uuids=None):
+    """Streams objects from the snapshot into batched imports. Returns True if all succeeded"""
+    imported, failed = 0, 0
+    with SnapshotReader(snapshot_path) as reader:
+        print(f"📝 Snapshot of {reader.toc.get('source')} from {reader.toc.get('created')}: "
+              f"{len(reader.objects)} objects")
+        for resource, zip_path, count in iter_restore_batches(reader, uuids, IMPORT_BATCH_SIZE):
+            print(f"⬆️ Importing {count} object(s) as {resource} bundle {os.path.basename(zip_path)}")
+            success, _ = import_zip(session, url, zip_path, resource=resource)
+            if success:
+                imported += 1
+            else:
+                failed += 1
+    print(f"✅ Bundles imported: {imported}")
+    if failed:
+        print(f"❌ Bundles failed: {failed}")
+    return failed == 0
+
+
+# =============================
+# MAIN EXECUTION
+# =============================
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] not in ("create", "create-from-repo", "restore"):
+        print("Usage: python -m scripts.snapshot create|create-from-repo|restore [snapshot.zip] [uuid ...]")
+        exit(1)
+
+    command = sys.argv[1]
+    snapshot_path = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_SNAPSHOT
+
+    if command == "create-from-repo":
+        create_snapshot_from_repo(EXPORTS_DIR, snapshot_path)
+        exit()
+
+    session = login_superset(SUPERSET_URL, USERNAME, PASSWORD)
+    if not session:
+        exit(1)
+
+    if command == "create":
+        create_snapshot(session, SUPERSET_URL, snapshot_path)
+    else:
+        csrf_token = get_csrf_token(session, SUPERSET_URL)
+        if not csrf_token:
+            exit(1)
+        session.headers.update({"X-CSRFToken": csrf_token})
+        if not restore_snapshot(session, SUPERSET_URL, snapshot_path, sys.argv[3:] or None):
+            exit(1)
@@ -2,10 +2,19 @@ import os
 import subprocess
 from utils.utils import (
     detect_changed_object_and_create_zip,
+    find_objects_changed_after_pull,
     login_superset,
     get_csrf_token,
-    import_zip
+    import_zip,
+    import_zips_verified,
+    find_changed_root_uuids,
+    run_import_jobs,
+    find_existing_uuids
 )
+from utils.adaptive import ENDPOINT_LIMITS
+from utils.dependencies import find_objects_covered_by_dashboards
+from utils.metadata_index import find_impacted_objects
+from utils.profiling import start_profiling
 
 # =============================
 # CONFIGURATION
@@ -18,6 +27,20 @@ REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
 EXPORTS_DIR = os.path.join(REPO_ROOT, "superset_exports")   # folders with exported objects
 ZIPS_DIR = os.path.join(REPO_ROOT, ".tmp_zips")             # temporary folder for zips
 
+# SUPERSET_SYNC_CLOSURE=1 skips charts/datasets new to Dev that already ship inside a changed dashboard
+SYNC_CLOSURE = os.environ.get("SUPERSET_SYNC_CLOSURE", "0") == "1"
+# SUPERSET_IMPACT_INDEX=1 also zips objects depending on a changed one (e.g. charts of a changed dataset)
+IMPACT_INDEX = os.environ.get("SUPERSET_IMPACT_INDEX", "0") == "1"
+
+# SUPERSET_VERIFY_IMPORT=1 checks imported objects on the target and retries mismatches
+VERIFY_IMPORT = os.environ.get("SUPERSET_VERIFY_IMPORT", "0") == "1"
+VERIFY_RETRIES = int(os.environ.get("SUPERSET_VERIFY_RETRIES", "1"))
+
+# SUPERSET_ADAPTIVE=1 paces API calls to what the instance sustains and honors Retry-After,
+# importing up to the import limiter's maximum of zips of one type in parallel
+ADAPTIVE = os.environ.get("SUPERSET_ADAPTIVE", "0") == "1"
+IMPORT_WORKERS = ENDPOINT_LIMITS["import"][1] if ADAPTIVE else 1
+
 # Keep folder names plural, map to API singular names
 RESOURCE_API_MAP = {
     "datasets": "dataset",
@@ -29,6 +52,7 @@ RESOURCE_API_MAP = {
 # MAIN EXECUTION
 # =============================
 if __name__ == "__main__":
+    start_profiling("sync_git_to_dev")  # opt-in: SUPERSET_PROFILE=1 or --profile
     print("🟢 Git → Dev Sync Started ---\n")
 
     # Step 0: Pull latest changes from Git
@@ -40,18 +64,8 @@ if __name__ == "__main__":
         print(f"❌ Git pull failed: {e}")
         exit(1)
 
-    # Step 1: Detect new/changed objects and create zips
-    for folder_name in RESOURCE_API_MAP.keys():
-        detect_changed_object_and_create_zip(
-            repo_root=REPO_ROOT,
-            exports_dir=os.path.join(EXPORTS_DIR, folder_name),
-            zips_dir=os.path.join(ZIPS_DIR, folder_name),
-            object_type=folder_name,
-            workflow="pull"  # detect changes after git pull
-        )
-
-    # Step 2: Login to Superset Dev
-    session = login_superset(DEV_URL, USERNAME, PASSWORD)
+    # Step 1: Login to Superset Dev
+    session = login_superset(DEV_URL, USERNAME, PASSWORD, pool_size=IMPORT_WORKERS, adaptive=ADAPTIVE)
     if not session:
         exit()
 
@@ -60,7 +74,35 @@ if __name__ == "__main__":
         exit()
     session.headers.update({"X-CSRFToken": csrf_token})
 
+    # Step 2: Detect new/changed objects and create zips
+    covered, impacted = {}, {}
+    if SYNC_CLOSURE or IMPACT_INDEX:
+        changed = {
+            folder_name: find_objects_changed_after_pull(REPO_ROOT, os.path.join(EXPORTS_DIR, folder_name))
+            for folder_name in RESOURCE_API_MAP.keys()
+        }
+        if IMPACT_INDEX:
+            impacted = find_impacted_objects(REPO_ROOT, EXPORTS_DIR, changed)
+            for folder_name, objects in impacted.items():
+                changed.setdefault(folder_name, set()).update(objects)
+        if SYNC_CLOSURE:
+            covered = find_objects_covered_by_dashboards(
+                EXPORTS_DIR, changed, lambda uuids_by_type: find_existing_uuids(session, DEV_URL, uuids_by_type)
+            )
+
+    for folder_name in RESOURCE_API_MAP.keys():
+        detect_changed_object_and_create_zip(
+            repo_root=REPO_ROOT,
+            exports_dir=os.path.join(EXPORTS_DIR, folder_name),
+            zips_dir=os.path.join(ZIPS_DIR, folder_name),
+            object_type=folder_name,
+            workflow="pull",  # detect changes after git pull
+            skip_objects=covered.get(folder_name),
+            extra_objects=impacted.get(folder_name)
+        )
+
     # Step 3: Import zips into Dev
+    import_jobs = []
     for folder_name, api_resource_name in RESOURCE_API_MAP.items():
         resource_dir = os.path.join(ZIPS_DIR, folder_name)
         if not os.path.exists(resource_dir):
@@ -71,9 +113,24 @@ if __name__ == "__main__":
             print(f"🟠 No {folder_name} zips found.")
             continue
 
-        for zip_file in zip_files:
-            print(f"⬆️ Importing {folder_name}: {zip_file}")
-            import_zip(session, DEV_URL, os.path.join(resource_dir, zip_file), resource=api_resource_name)
+        import_jobs.extend((os.path.join(resource_dir, f), api_resource_name) for f in zip_files)
+
+    if import_jobs and VERIFY_IMPORT:
+        # Objects whose own YAML the pull changed must come out updated on Dev
+        expect_updated = find_changed_root_uuids(REPO_ROOT, EXPORTS_DIR, "HEAD@{1}")
+        verified, failed = import_zips_verified(
+            session, DEV_URL, import_jobs, retries=VERIFY_RETRIES, workers=IMPORT_WORKERS,
+            expect_updated=expect_updated
+        )
+        print(f"\n🔎 Verified imports: {verified}")
+        if failed:
+            print(f"❌ Unverified imports: {len(failed)} (zips kept in {ZIPS_DIR})")
+    elif import_jobs:
+        run_import_jobs(
+            import_jobs,
+            lambda zip_path, resource: import_zip(session, DEV_URL, zip_path, resource=resource),
+            IMPORT_WORKERS
+        )
 
     print("\n✅ Git → Dev Sync Complete ---")
 
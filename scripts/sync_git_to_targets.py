@@ -0,0 +1,251 @@
+import os
+import json
+import shutil
+import subprocess
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from utils.utils import (
+    create_zip_from_dir,
+    find_all_objects,
+    find_changed_root_uuids,
+    find_objects_changed_since,
+    get_head_commit,
+    login_superset,
+    get_csrf_token,
+    import_zip,
+    import_zip_verified,
+    run_import_jobs
+)
+from utils.adaptive import ENDPOINT_LIMITS
+from utils.layout import get_layout
+
+# =============================
+# SCRIPT: GIT → MANY SUPERSET TARGETS (FAN-OUT SYNC)
+# =============================
+# Builds the changed bundles once, then imports them into every target in parallel.
+# Each target remembers the last commit it was synced to, so a target that failed
+# or was offline catches up from its own commit on the next run.
+
+# =============================
+# CONFIGURATION
+# =============================
+# SUPERSET_TARGETS="dev=http://localhost:8090,staging=https://staging.example.com"
+# Credentials per target: SUPERSET_<NAME>_USER / SUPERSET_<NAME>_PASS (e.g. SUPERSET_STAGING_USER),
+# falling back to SUPERSET_ADMIN_USER / SUPERSET_ADMIN_PASS
+TARGETS = os.environ.get("SUPERSET_TARGETS", "dev=http://localhost:8090")
+USERNAME = os.environ.get("SUPERSET_ADMIN_USER", "admin")
+PASSWORD = os.environ.get("SUPERSET_ADMIN_PASS", "admin")
+
+# SUPERSET_VERIFY_IMPORT=1 checks imported objects on each target before counting them
+VERIFY_IMPORT = os.environ.get("SUPERSET_VERIFY_IMPORT", "0") == "1"
+# SUPERSET_ADAPTIVE=1 paces each target's API calls to what it sustains and honors Retry-After
+ADAPTIVE = os.environ.get("SUPERSET_ADAPTIVE", "0") == "1"
+# Zips of one type imported in parallel per target (the import limiter's maximum in adaptive mode)
+IMPORT_WORKERS = ENDPOINT_LIMITS["import"][1] if ADAPTIVE else 1
+# Connections per target client
+POOL_SIZE = max(int(os.environ.get("SUPERSET_POOL_SIZE", "4")), IMPORT_WORKERS)
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+EXPORTS_DIR = os.path.join(REPO_ROOT, "superset_exports")   # folders with exported objects
+ZIPS_DIR = os.path.join(REPO_ROOT, ".tmp_fanout_zips")      # zips shared by all targets
+STATE_DIR = os.path.join(REPO_ROOT, ".sync_state")          # last synced commit per target
+
+# Keep folder names plural, map to API singular names (import order)
+RESOURCE_API_MAP = {
+    "datasets": "dataset",
+    "charts": "chart",
+    "dashboards": "dashboard"
+}
+
+# =============================
+# HELPER FUNCTIONS
+# =============================
+
+def parse_targets(value):
+    """Parses "name=url,name=url" into [{"name", "url", "username", "password"}]"""
+    targets = []
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        name, _, url = entry.strip().partition("=")
+        env_name = name.upper().replace("-", "_")
+        targets.append({
+            "name": name,
+            "url": url.rstrip("/"),
+            "username": os.environ.get(f"SUPERSET_{env_name}_USER", USERNAME),
+            "password": os.environ.get(f"SUPERSET_{env_name}_PASS", PASSWORD),
+        })
+    return targets
+
+
+def load_target_state(target_name):
+    """Returns the saved sync state of a target ({} if it was never synced)"""
+    state_path = os.path.join(STATE_DIR, f"{target_name}.json")
+    if not os.path.exists(state_path):
+        return {}
+    with open(state_path) as f:
+        return json.load(f)
+
+
+def save_target_state(target_name, state):
+    """Persists the sync state of a target"""
+    os.makedirs(STATE_DIR, exist_ok=True)
+    state_path = os.path.join(STATE_DIR, f"{target_name}.json")
+    with open(state_path, "w") as f:
+        json.dump(state, f, indent=2)
+
+
+def find_target_changes(target):
+    """
+    Returns {folder_name: set(objects)} the target still needs: everything changed
+    since its last synced commit, or every object if it was never synced.
+    """
+    last_commit = load_target_state(target["name"]).get("last_synced_commit")
+    changes = {}
+    layout = get_layout(EXPORTS_DIR)
+    for folder_name in RESOURCE_API_MAP.keys():
+        exports_dir = os.path.join(EXPORTS_DIR, folder_name)
+        changed = None
+        if last_commit:
+            changed = find_objects_changed_since(REPO_ROOT, exports_dir, last_commit)
+        if changed is None:
+            changed = find_all_objects(exports_dir)
+        # Deleted objects can't be imported
+        changes[folder_name] = {obj for obj in changed if os.path.isdir(layout.object_dir(exports_dir, obj))}
+    return changes
+
+
+def build_zips(changes_by_target):
+    """Zips the union of every target's changes once. Returns {(folder_name, obj): zip_path}"""
+    zips = {}
+    layout = get_layout(EXPORTS_DIR)
+    for changes in changes_by_target.values():
+        for folder_name, objects in changes.items():
+            for obj in objects:
+                if (folder_name, obj) in zips:
+                    continue
+                zips_dir = os.path.join(ZIPS_DIR, folder_name)
+                os.makedirs(zips_dir, exist_ok=True)
+                zip_file = create_zip_from_dir(
+                    layout.folder_path(EXPORTS_DIR, f"{folder_name}/{obj}"),
+                    os.path.join(zips_dir, f"{obj}.zip")
+                )
+                if zip_file:
+                    zips[(folder_name, obj)] = zip_file
+    print(f"📦 Built {len(zips)} zip(s) for {len(changes_by_target)} target(s)")
+    return zips
+
+
+def sync_target(target, changes, zips, head_commit):
+    """Imports a target's changed zips with its own pooled client. Returns the target's result"""
+    name, url = target["name"], target["url"]
+    result = {"target": name, "imported": 0, "failed": [], "error": None}
+
+    # With verification, objects whose own YAML changed since the target's last sync
+    # must come out updated (a never-synced target only gets existence checks)
+    expect_updated = None
+    last_commit = load_target_state(name).get("last_synced_commit")
+    if VERIFY_IMPORT and last_commit:
+        expect_updated = find_changed_root_uuids(REPO_ROOT, EXPORTS_DIR, last_commit)
+
+    # An unreachable or failing target is reported in its result, not raised,
+    # so it can't hide the other targets' results
+    try:
+        session = login_superset(url, target["username"], target["password"], pool_size=POOL_SIZE, adaptive=ADAPTIVE)
+        if not session:
+            result["error"] = "login failed"
+            return result
+        csrf_token = get_csrf_token(session, url)
+        if not csrf_token:
+            result["error"] = "no CSRF token"
+            return result
+        session.headers.update({"X-CSRFToken": csrf_token})
+
+        jobs, job_objects = [], {}
+        for folder_name, api_resource_name in RESOURCE_API_MAP.items():
+            for obj in sorted(changes.get(folder_name, ())):
+                zip_path = zips.get((folder_name, obj))
+                if not zip_path:
+                    result["failed"].append(f"{folder_name}/{obj}")
+                    continue
+                jobs.append((zip_path, api_resource_name))
+                job_objects[zip_path] = f"{folder_name}/{obj}"
+
+        def import_one(zip_path, resource):
+            print(f"⬆️ [{name}] Importing {job_objects[zip_path]}")
+            if VERIFY_IMPORT:
+                return import_zip_verified(session, url, zip_path, resource=resource, expect_updated=expect_updated)
+            success, _ = import_zip(session, url, zip_path, resource=resource, delete_on_success=False)
+            return success
+
+        for zip_path, _, success in run_import_jobs(jobs, import_one, IMPORT_WORKERS):
+            if success:
+                result["imported"] += 1
+            else:
+                result["failed"].append(job_objects[zip_path])
+    except requests.RequestException as e:
+        result["error"] = f"request failed: {e}"
+        return result
+
+    # Only move the target forward once everything it needed is in
+    if not result["failed"]:
+        save_target_state(name, {"last_synced_commit": head_commit, "url": url})
+    return result
+
+
+# =============================
+# MAIN EXECUTION
+# =============================
+if __name__ == "__main__":
+    print("🟢 Git → Targets Fan-out Sync Started ---\n")
+
+    targets = parse_targets(TARGETS)
+    if not targets:
+        print("❌ No targets configured (SUPERSET_TARGETS)")
+        exit(1)
+
+    # Step 0: Pull latest changes from Git
+    try:
+        print("🔄 Running git pull ...")
+        subprocess.check_call(["git", "pull", "origin", "main"], cwd=REPO_ROOT)
+        print("✅ Git pull complete")
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Git pull failed: {e}")
+        exit(1)
+    head_commit = get_head_commit(REPO_ROOT)
+
+    # Step 1: Work out what each target is missing, then zip the union once
+    changes_by_target = {target["name"]: find_target_changes(target) for target in targets}
+    for target_name, changes in changes_by_target.items():
+        pending = sum(len(objects) for objects in changes.values())
+        print(f"📝 {target_name}: {pending} object(s) to sync")
+    zips = build_zips(changes_by_target)
+
+    # Step 2: Import into every target concurrently
+    try:
+        with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+            futures = [
+                executor.submit(sync_target, target, changes_by_target[target["name"]], zips, head_commit)
+                for target in targets
+            ]
+            results = [future.result() for future in futures]
+    finally:
+        # Step 3: Clean up shared zips
+        shutil.rmtree(ZIPS_DIR, ignore_errors=True)
+
+    print("\n--- Per-target results ---")
+    all_ok = True
+    for result in results:
+        if result["error"]:
+            all_ok = False
+            print(f"❌ {result['target']}: {result['error']}")
+        elif result["failed"]:
+            all_ok = False
+            print(f"⚠️  {result['target']}: {result['imported']} imported, {len(result['failed'])} failed "
+                  f"(will catch up next run): {', '.join(result['failed'])}")
+        else:
+            print(f"✅ {result['target']}: {result['imported']} imported")
+
+    print("\n✅ Git → Targets Fan-out Sync Complete ---")
+    if not all_ok:
+        exit(1)
@@ -1,5 +1,8 @@
 import os
-from utils.utils import detect_changed_object_and_create_zip
+import requests
+from utils.utils import detect_changed_object_and_create_zip, find_changed_objects, login_superset, find_existing_uuids
+from utils.dependencies import find_objects_covered_by_dashboards
+from utils.metadata_index import find_impacted_objects
 
 # =============================
 # CONFIGURATION
@@ -15,12 +18,49 @@ OBJECTS = {
     "dashboards": "dashboards"
 }
 
+# SUPERSET_SYNC_CLOSURE=1 skips charts/datasets already shipped inside a changed dashboard,
+# if they don't exist yet on the instance the zips are imported into (see scripts/import.py)
+SYNC_CLOSURE = os.environ.get("SUPERSET_SYNC_CLOSURE", "0") == "1"
+TARGET_URL = os.environ.get("SUPERSET_PROD_URL", "https://5750dff529b5.ngrok-free.app/").rstrip("/")
+USERNAME = os.environ.get("SUPERSET_ADMIN_USER", "admin")
+PASSWORD = os.environ.get("SUPERSET_ADMIN_PASS", "admin")
+# SUPERSET_IMPACT_INDEX=1 also zips objects depending on a changed one (e.g. charts of a changed dataset)
+IMPACT_INDEX = os.environ.get("SUPERSET_IMPACT_INDEX", "0") == "1"
+
+# =============================
+# HELPER FUNCTIONS
+# =============================
+
+def find_existing_on_target(uuids_by_type):
+    """Returns the uuids already on the import target, or None if it can't be reached"""
+    try:
+        session = login_superset(TARGET_URL, USERNAME, PASSWORD)
+        if not session:
+            return None
+        return find_existing_uuids(session, TARGET_URL, uuids_by_type)
+    except requests.RequestException as e:
+        print(f"❌ Target check failed: {e}")
+        return None
+
 # =============================
 # MAIN EXECUTION
 # =============================
 if __name__ == "__main__":
     print("--- Starting Superset Change Detection & ZIP Creation ---\n")
 
+    covered, impacted = {}, {}
+    if SYNC_CLOSURE or IMPACT_INDEX:
+        changed = {
+            folder_name: find_changed_objects(REPO_ROOT, os.path.join(EXPORTS_BASE_DIR, folder_name))
+            for folder_name in OBJECTS.values()
+        }
+        if IMPACT_INDEX:
+            impacted = find_impacted_objects(REPO_ROOT, EXPORTS_BASE_DIR, changed)
+            for folder_name, objects in impacted.items():
+                changed.setdefault(folder_name, set()).update(objects)
+        if SYNC_CLOSURE:
+            covered = find_objects_covered_by_dashboards(EXPORTS_BASE_DIR, changed, find_existing_on_target)
+
     for object_type, folder_name in OBJECTS.items():
         print(f"--- Processing {object_type} ---")
 
@@ -29,7 +69,9 @@ if __name__ == "__main__":
             exports_dir=os.path.join(EXPORTS_BASE_DIR, folder_name),
             zips_dir=os.path.join(ZIPS_BASE_DIR, folder_name),
             object_type=object_type,
-            workflow="local"  # optional, default is "local"
+            workflow="local",  # optional, default is "local"
+            skip_objects=covered.get(folder_name),
+            extra_objects=impacted.get(folder_name)
         )
 
 
@@ -1,5 +1,7 @@
 import os
-from utils.utils import create_zip_from_dir, login_superset, get_csrf_token, import_zip
+from utils.utils import create_zip_from_dir, login_superset, get_csrf_token, import_zip, import_zips_verified
+from utils.profiling import start_profiling
+from utils.layout import layout_for_type_dir
 
 # =============================
 # CONFIGURATION
@@ -20,6 +22,10 @@ OBJECTS = {
     "dashboards": "dashboards"
 }
 
+# SUPERSET_VERIFY_IMPORT=1 checks imported objects on the target and retries mismatches
+VERIFY_IMPORT = os.environ.get("SUPERSET_VERIFY_IMPORT", "0") == "1"
+VERIFY_RETRIES = int(os.environ.get("SUPERSET_VERIFY_RETRIES", "1"))
+
 def zip_all_objects():
     """Create zip files for ALL objects regardless of git changes"""
     print("--- Starting Superset ALL Objects ZIP Creation ---\n")
@@ -39,12 +45,10 @@ def zip_all_objects():
             print(f"⚠️  Exports directory not found: {exports_dir}")
             continue
         
-        # Get all object directories
-        object_dirs = []
-        for item in os.listdir(exports_dir):
-            item_path = os.path.join(exports_dir, item)
-            if os.path.isdir(item_path):
-                object_dirs.append(item)
+        # Get all object directories (flat or sharded, see utils/layout.py)
+        object_dirs = {
+            entry.name: entry.path for entry in layout_for_type_dir(exports_dir).iter_objects(exports_dir)
+        }
         
         if not object_dirs:
             print(f"🟠 No {object_type} found in {exports_dir}")
@@ -54,7 +58,7 @@ def zip_all_objects():
                 print(f"  - {obj_dir}")
                 
                 # Create zip for this object
-                object_path = os.path.join(exports_dir, obj_dir)
+                object_path = object_dirs[obj_dir]
                 output_zip = os.path.join(zips_dir, f"{obj_dir}.zip")
                 
                 zip_file = create_zip_from_dir(object_path, output_zip)
@@ -110,6 +114,15 @@ def import_all_zips():
             continue
         
         print(f"📝 Found {len(zip_files)} {resource_name} zip files")
+
+        if VERIFY_IMPORT:
+            jobs = [(os.path.join(folder_path, f), resource_name) for f in sorted(zip_files)]
+            verified, failed = import_zips_verified(session, LOCAL_URL, jobs, retries=VERIFY_RETRIES)
+            total_imported += verified
+            total_failed += len(failed)
+            for zip_path in failed:
+                print(f"❌ Failed to verify import: {os.path.basename(zip_path)}")
+            continue
         
         for zip_file in sorted(zip_files):
             zip_path = os.path.join(folder_path, zip_file)
@@ -160,4 +173,5 @@ def zip_and_import_all():
 # MAIN EXECUTION
 # =============================
 if __name__ == "__main__":
+    start_profiling("zip_all_object_and_import_to_local")  # opt-in: SUPERSET_PROFILE=1 or --profile
     zip_and_import_all()
@@ -0,0 +1,186 @@
+# adaptive.py
+import os
+import re
+import time
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlparse
+import requests
+
+# ------------------------------
+# Adaptive Concurrency (AIMD)
+# ------------------------------
+
+# Per endpoint class: (initial, maximum) requests in flight
+ENDPOINT_LIMITS = {
+    "list": (4, int(os.environ.get("SUPERSET_MAX_INFLIGHT_LIST", "16"))),
+    "export": (2, int(os.environ.get("SUPERSET_MAX_INFLIGHT_EXPORT", "8"))),
+    "import": (1, int(os.environ.get("SUPERSET_MAX_INFLIGHT_IMPORT", "2"))),
+}
+
+DECREASE_FACTOR = 0.5      # on 429 / 5xx
+LATENCY_DECREASE = 0.9     # when latency drifts above the observed floor
+LATENCY_TOLERANCE = 2.0    # smoothed latency above floor * tolerance counts as overload
+LATENCY_WINDOW = 20        # the floor is the best latency among a route's last N responses
+EWMA_WEIGHT = 0.2
+MAX_429_RETRIES = 3
+# Delay after a 429 without Retry-After: observed latency (at least BACKOFF_MIN) doubled per attempt
+BACKOFF_MIN = 0.5
+BACKOFF_MAX = 30.0
+
+ID_SEGMENT_RE = re.compile(r"/\d+(?=/|$)")
+
+
+def classify_endpoint(url):
+    """Maps a Superset API url to its limiter class: "import", "export" or "list" """
+    path = urlparse(url).path
+    if "/import" in path:
+        return "import"
+    if "/export" in path:
+        return "export"
+    return "list"
+
+
+def route_of(method, url):
+    """Groups requests whose latencies are comparable: method + path with ids collapsed"""
+    return f"{method.upper()} {ID_SEGMENT_RE.sub('/<id>', urlparse(url).path)}"
+
+
+def parse_retry_after(value):
+    """Returns the delay in seconds of a Retry-After header (seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class AIMDLimiter:
+    """
+    Bounds in-flight requests for one endpoint class. The limit grows by one per
+    round of successful requests and is cut multiplicatively on 429/5xx responses
+    or when a route's smoothed latency rises well above its best recent latency.
+    Latency is compared per route (one class mixes e.g. login and list pages), and
+    the floor only covers the last LATENCY_WINDOW responses so one unusually fast
+    call can't pin the limit down. Retry-After pauses new requests until the
+    server asks to be called again.
+    """
+
+    def __init__(self, name, initial, maximum, minimum=1):
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = max(maximum, minimum)
+        self.in_flight = 0
+        self.latency_ewma = None
+        self.routes = {}  # route -> {"ewma": seconds, "window": recent latencies}
+        self.blocked_until = 0.0
+        self.last_decrease = 0.0
+        self.requests = 0
+        self.throttled = 0
+        self.condition = threading.Condition()
+
+    def acquire(self):
+        with self.condition:
+            while True:
+                wait = self.blocked_until - time.monotonic()
+                if wait <= 0 and self.in_flight < int(self.limit):
+                    self.in_flight += 1
+                    return
+                self.condition.wait(timeout=wait if wait > 0 else None)
+
+    def release(self, latency, status_code=None, retry_after=None, route=None):
+        with self.condition:
+            self.in_flight -= 1
+            self.requests += 1
+            now = time.monotonic()
+
+            if retry_after:
+                self.blocked_until = max(self.blocked_until, now + retry_after)
+
+            overloaded = status_code is None or status_code == 429 or status_code >= 500
+            if overloaded:
+                self.throttled += 1
+                self._decrease(now, DECREASE_FACTOR)
+            elif latency is not None:
+                self.latency_ewma = _ewma(self.latency_ewma, latency)
+                stats = self.routes.setdefault(route, {"ewma": None, "window": deque(maxlen=LATENCY_WINDOW)})
+                stats["ewma"] = _ewma(stats["ewma"], latency)
+                stats["window"].append(latency)
+                if stats["ewma"] > min(stats["window"]) * LATENCY_TOLERANCE:
+                    self._decrease(now, LATENCY_DECREASE)
+                else:
+                    # Additive increase: +1 per limit's worth of successful requests
+                    self.limit = min(self.maximum, self.limit + 1.0 / self.limit)
+
+            self.condition.notify_all()
+
+    def backoff_delay(self, attempt):
+        """Fallback delay before retry `attempt` (0-based) when the server sent no Retry-After"""
+        with self.condition:
+            base = max(BACKOFF_MIN, self.latency_ewma or 0.0)
+        return min(BACKOFF_MAX, base * 2 ** attempt)
+
+    def _decrease(self, now, factor):
+        # At most one cut per observed round trip, so a burst of errors counts once
+        if now - self.last_decrease < (self.latency_ewma or 0.0):
+            return
+        self.limit = max(self.minimum, self.limit * factor)
+        self.last_decrease = now
+
+    def summary(self):
+        return f"{self.name}: limit={self.limit:.1f} requests={self.requests} throttled={self.throttled}"
+
+
+def _ewma(current, sample):
+    return sample if current is None else EWMA_WEIGHT * sample + (1 - EWMA_WEIGHT) * current
+
+
+class AdaptiveSession(requests.Session):
+    """
+    requests.Session that routes every call through the AIMD limiter of its
+    endpoint class (list / export / import), so concurrent workers converge on
+    what the target Superset can sustain. GET requests answered with 429 are
+    retried after Retry-After, or after an exponential backoff if it is missing.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.limiters = {
+            name: AIMDLimiter(name, initial, maximum)
+            for name, (initial, maximum) in ENDPOINT_LIMITS.items()
+        }
+
+    def request(self, method, url, *args, **kwargs):
+        limiter = self.limiters[classify_endpoint(url)]
+        route = route_of(method, url)
+        for attempt in range(MAX_429_RETRIES + 1):
+            limiter.acquire()
+            started = time.monotonic()
+            try:
+                resp = super().request(method, url, *args, **kwargs)
+            except requests.RequestException:
+                limiter.release(None)
+                raise
+            retry_after = parse_retry_after(resp.headers.get("Retry-After"))
+            if resp.status_code == 429 and retry_after is None:
+                retry_after = limiter.backoff_delay(attempt)
+            limiter.release(time.monotonic() - started, resp.status_code, retry_after, route)
+
+            # Uploads can't be replayed (the file handle is consumed), only retry GETs
+            if resp.status_code != 429 or method.upper() != "GET" or attempt == MAX_429_RETRIES:
+                return resp
+            print(f"🟠 Throttled by Superset, retrying in {retry_after:.1f}s")
+        return resp
+
+    def summary(self):
+        """One line per endpoint class with its converged limit and throttled count"""
+        return "\n".join(limiter.summary() for limiter in self.limiters.values())
@@ -0,0 +1,227 @@
+# dependencies.py
+import os
+import yaml
+from utils.layout import get_layout
+
+# ------------------------------
+# Dependency Index
+# ------------------------------
+
+# Top-level folder inside an export bundle -> object type
+BUNDLE_TYPES = {
+    "dashboards": "dashboard",
+    "charts": "chart",
+    "datasets": "dataset",
+    "databases": "database",
+}
+
+
+def bundle_member_type(member_path):
+    """Returns the object type of a bundle member (e.g. charts/chart_1_1.yaml -> chart)"""
+    return BUNDLE_TYPES.get(member_path.replace(os.sep, "/").split("/")[0])
+
+
+def extract_dependencies(object_type, data):
+    """
+    Returns the uuids an exported object depends on:
+      dashboard -> charts in `position` and datasets targeted by native filters in `metadata`
+      chart     -> dataset_uuid
+      dataset   -> database_uuid
+    """
+    deps = set()
+    if object_type == "dashboard":
+        for node in (data.get("position") or {}).values():
+            if isinstance(node, dict) and node.get("type") == "CHART":
+                chart_uuid = (node.get("meta") or {}).get("uuid")
+                if chart_uuid:
+                    deps.add(chart_uuid)
+        metadata = data.get("metadata") or {}
+        for native_filter in metadata.get("native_filter_configuration") or []:
+            for target in native_filter.get("targets") or []:
+                if target.get("datasetUuid"):
+                    deps.add(target["datasetUuid"])
+    elif object_type == "chart":
+        if data.get("dataset_uuid"):
+            deps.add(data["dataset_uuid"])
+    elif object_type == "dataset":
+        if data.get("database_uuid"):
+            deps.add(data["database_uuid"])
+    return deps
+
+
+def parse_export_file(member_path, content):
+    """Parses one exported YAML file into (uuid, type, deps), or None if it is not an object"""
+    object_type = bundle_member_type(member_path)
+    if not object_type:
+        return None
+    try:
+        data = yaml.safe_load(content)
+    except yaml.YAMLError as e:
+        print(f"❌ Failed to parse {member_path}: {e}")
+        return None
+    if not isinstance(data, dict) or not data.get("uuid"):
+        return None
+    return data["uuid"], object_type, extract_dependencies(object_type, data)
+
+
+class DependencyIndex:
+    """
+    In-memory uuid -> dependency index built from exported YAML, either from an
+    export bundle (zip members) or from the object folders under superset_exports/.
+    """
+
+    def __init__(self):
+        self.objects = {}    # uuid -> {"type", "member", "deps"}
+        self.folders = {}    # uuid -> object folder that owns it (e.g. charts/chart_1)
+        self.locations = {}  # uuid -> {folder: member path} for every copy on disk
+
+    def add_file(self, member_path, content, folder=None):
+        """Adds one exported YAML file. Returns its uuid, or None if it is not an object"""
+        parsed = parse_export_file(member_path, content)
+        if not parsed:
+            return None
+        obj_uuid, object_type, deps = parsed
+        self.objects[obj_uuid] = {"type": object_type, "member": member_path, "deps": deps}
+        if folder:
+            self.locations.setdefault(obj_uuid, {})[folder] = member_path
+            # The folder owns the object if it sits under the folder's own type dir
+            if member_path.replace(os.sep, "/").split("/")[0] == folder.split("/")[0]:
+                self.folders[obj_uuid] = folder
+        return obj_uuid
+
+    def add_bundle(self, members):
+        """Adds every member of an export bundle ({member path: content}). Returns their uuids"""
+        uuids = set()
+        for member_path, content in members.items():
+            obj_uuid = self.add_file(member_path, content)
+            if obj_uuid:
+                uuids.add(obj_uuid)
+        return uuids
+
+    def add_object_folder(self, exports_dir, folder, folder_path=None):
+        """Adds every YAML file of one object folder (e.g. charts/chart_1)"""
+        folder_path = folder_path or get_layout(exports_dir).folder_path(exports_dir, folder)
+        for root, _, files in os.walk(folder_path):
+            for file_name in files:
+                if not file_name.endswith(".yaml") or file_name == "metadata.yaml":
+                    continue
+                full_path = os.path.join(root, file_name)
+                member_path = os.path.relpath(full_path, folder_path).replace(os.sep, "/")
+                with open(full_path) as f:
+                    self.add_file(member_path, f.read(), folder=folder)
+
+    def load_exports_dir(self, exports_dir, types=("datasets", "charts", "dashboards")):
+        """Indexes every object folder under exports_dir (superset_exports/)"""
+        layout = get_layout(exports_dir)
+        for type_dir in types:
+            for entry in layout.iter_objects(os.path.join(exports_dir, type_dir)):
+                self.add_object_folder(exports_dir, f"{type_dir}/{entry.name}", folder_path=entry.path)
+        return self
+
+    def closure(self, obj_uuid):
+        """Returns obj_uuid plus every uuid it transitively depends on"""
+        seen = set()
+        stack = [obj_uuid]
+        while stack:
+            current = stack.pop()
+            if current in seen:
+                continue
+            seen.add(current)
+            stack.extend(self.objects.get(current, {}).get("deps", ()))
+        return seen
+
+    def members_for(self, uuids):
+        """Returns the bundle member paths of the given uuids"""
+        return {self.objects[u]["member"] for u in uuids if u in self.objects}
+
+
+# ------------------------------
+# Closure Helpers
+# ------------------------------
+
+def split_bundle_by_owner(index, members):
+    """
+    Splits a dashboard export bundle into the member sets of the object folders
+    already on disk, so each chart/dataset in the closure is written once from the
+    dashboard bundle instead of being exported again on its own.
+    Returns {folder: [member paths]} for charts and datasets with a known folder.
+    """
+    bundle_index = DependencyIndex()
+    bundle_uuids = bundle_index.add_bundle(members)
+
+    by_folder = {}
+    for obj_uuid in bundle_uuids:
+        if bundle_index.objects[obj_uuid]["type"] not in ("chart", "dataset"):
+            continue
+        folder = index.folders.get(obj_uuid)
+        if not folder:
+            continue
+        by_folder[folder] = sorted(bundle_index.members_for(bundle_index.closure(obj_uuid)))
+    return by_folder
+
+
+def find_objects_covered_by_dashboards(exports_dir, changed, find_existing):
+    """
+    Finds changed charts/datasets whose current content already ships inside a
+    changed dashboard folder, so importing the dashboard covers them in one pass.
+    Superset creates the charts/datasets bundled with a dashboard if missing but
+    never overwrites them, so only objects new to the target can be covered.
+
+    Args:
+        exports_dir (str): Absolute path to superset_exports/.
+        changed (dict): {"datasets": set(folders), "charts": ..., "dashboards": ...}
+        find_existing (callable): Takes {object type: set(uuids)} and returns the
+            uuids that already exist on the target (None if that can't be checked).
+    Returns:
+        dict: {"datasets": set(folders), "charts": set(folders)} that can be skipped.
+    """
+    covered = {}
+    dashboards = changed.get("dashboards") or set()
+    if not dashboards:
+        return covered
+
+    index = DependencyIndex()
+    for type_dir, folders in changed.items():
+        for folder in folders:
+            index.add_object_folder(exports_dir, f"{type_dir}/{folder}")
+
+    candidates = {}  # uuid -> owner folder
+    for dashboard in dashboards:
+        dashboard_folder = f"dashboards/{dashboard}"
+        for obj_uuid, locations in index.locations.items():
+            owner = index.folders.get(obj_uuid)
+            if dashboard_folder not in locations or not owner or owner.startswith("dashboards/"):
+                continue
+            # Only covered if every file of the object's closure is identical in both folders
+            closure = index.closure(obj_uuid)
+            if all(_same_file(exports_dir, index, u, owner, dashboard_folder) for u in closure):
+                candidates[obj_uuid] = owner
+
+    if not candidates:
+        return covered
+
+    uuids_by_type = {}
+    for obj_uuid in candidates:
+        uuids_by_type.setdefault(index.objects[obj_uuid]["type"], set()).add(obj_uuid)
+    existing = find_existing(uuids_by_type)
+    if existing is None:
+        print("🟠 Couldn't check which objects exist on the target, importing every changed object")
+        return covered
+
+    for obj_uuid, owner in candidates.items():
+        if obj_uuid in existing:
+            continue
+        type_dir, folder = owner.split("/", 1)
+        covered.setdefault(type_dir, set()).add(folder)
+    return covered
+
+
+def _same_file(exports_dir, index, obj_uuid, folder_a, folder_b):
+    """True if obj_uuid has byte-identical copies in both folders"""
+    locations = index.locations.get(obj_uuid, {})
+    if folder_a not in locations or folder_b not in locations:
+        return False
+    layout = get_layout(exports_dir)
+    with open(os.path.join(layout.folder_path(exports_dir, folder_a), locations[folder_a]), "rb") as a, \
+            open(os.path.join(layout.folder_path(exports_dir, folder_b), locations[folder_b]), "rb") as b:
+        return a.read() == b.read()
@@ -0,0 +1,143 @@
+# layout.py
+import os
+import re
+import hashlib
+import threading
+
+# ------------------------------
+# Export Directory Layout
+# ------------------------------
+# Object folders live under superset_exports/<type>s/ in one of two layouts:
+#
+#   flat      superset_exports/charts/chart_1/...
+#   sharded   superset_exports/charts/<shard>/chart_1/...
+#
+# where <shard> is the first two hex digits of a hash of the folder name (256
+# subdirectories per type). The layout in use is recorded in
+# superset_exports/.layout (no file means flat) and switched with
+# `python -m scripts.migrate_export_layout flat|sharded`.
+
+LAYOUT_FILE = ".layout"
+FLAT = "flat"
+SHARDED = "sharded"
+LAYOUTS = (FLAT, SHARDED)
+
+# Object folders are named <endpoint>_<id>, so they never look like a shard
+SHARD_RE = re.compile(r"^[0-9a-f]{2}$")
+
+
+def shard_of(obj):
+    """Returns the shard subdirectory of an object folder name (e.g. chart_1 -> '3f')"""
+    return hashlib.blake2b(obj.encode("utf-8"), digest_size=1).hexdigest()
+
+
+class ExportLayout:
+    """Resolves object folders to paths and back for one layout"""
+
+    def __init__(self, name=FLAT):
+        if name not in LAYOUTS:
+            raise ValueError(f"Unknown export layout: {name!r} (expected one of {', '.join(LAYOUTS)})")
+        self.name = name
+        self.sharded = name == SHARDED
+
+    def object_dir(self, type_path, obj):
+        """Path of object folder `obj` inside a type directory (e.g. superset_exports/charts)"""
+        if self.sharded:
+            return os.path.join(type_path, shard_of(obj), obj)
+        return os.path.join(type_path, obj)
+
+    def folder_path(self, exports_root, folder):
+        """Path of an object folder given as <type dir>/<object> (e.g. charts/chart_1)"""
+        type_dir, obj = folder.split("/", 1)
+        return self.object_dir(os.path.join(exports_root, type_dir), obj)
+
+    def iter_objects(self, type_path):
+        """Yields an os.DirEntry per object folder inside a type directory"""
+        if not os.path.isdir(type_path):
+            return
+        with os.scandir(type_path) as entries:
+            for entry in entries:
+                if not entry.is_dir():
+                    continue
+                if not self.sharded:
+                    yield entry
+                elif SHARD_RE.match(entry.name):
+                    with os.scandir(entry.path) as shard_entries:
+                        yield from (e for e in shard_entries if e.is_dir())
+
+    def list_objects(self, type_path):
+        """Returns the names of every object folder inside a type directory"""
+        return {entry.name for entry in self.iter_objects(type_path)}
+
+
+_layouts = {}
+_layouts_lock = threading.Lock()
+
+
+def get_layout(exports_root):
+    """Returns the ExportLayout recorded for exports_root (read once per process)"""
+    key = os.path.abspath(exports_root)
+    with _layouts_lock:
+        if key not in _layouts:
+            try:
+                with open(os.path.join(key, LAYOUT_FILE)) as f:
+                    name = f.read().strip() or FLAT
+            except FileNotFoundError:
+                name = FLAT
+            _layouts[key] = ExportLayout(name)
+        return _layouts[key]
+
+
+def layout_for_type_dir(type_path):
+    """Returns the ExportLayout of a type directory (e.g. superset_exports/charts)"""
+    return get_layout(os.path.dirname(os.path.abspath(type_path)))
+
+
+def set_layout(exports_root, name):
+    """Records the layout of exports_root (flat removes the marker file)"""
+    layout = ExportLayout(name)
+    marker = os.path.join(exports_root, LAYOUT_FILE)
+    if layout.sharded:
+        with open(marker, "w") as f:
+            f.write(f"{name}\n")
+    elif os.path.exists(marker):
+        os.remove(marker)
+    with _layouts_lock:
+        _layouts[os.path.abspath(exports_root)] = layout
+    return layout
+
+
+# ------------------------------
+# Path Parsing
+# ------------------------------
+
+def split_object_path(parts):
+    """
+    Splits the parts of a path relative to a type directory into
+    (object folder, [member path parts]). Works for both layouts, so paths from
+    before and after a migration (e.g. in git history) resolve alike.
+    Returns (None, []) if the path doesn't reach an object folder.
+    """
+    if len(parts) > 1 and SHARD_RE.match(parts[0]):
+        parts = parts[1:]
+    if not parts or not parts[0]:
+        return None, []
+    return parts[0], parts[1:]
+
+
+def git_prefix(repo_root, path):
+    """Returns `path` as git reports it (relative to repo_root, "/" separated, trailing "/")"""
+    rel_path = os.path.relpath(os.path.abspath(path), os.path.abspath(repo_root))
+    return rel_path.replace(os.sep, "/") + "/"
+
+
+def objects_from_git_paths(file_paths, prefix):
+    """Returns the object folders touched by repo-relative git paths under `prefix` (a type dir)"""
+    objects = set()
+    prefix_len = len(prefix)
+    for file_path in file_paths:
+        if file_path.startswith(prefix):
+            obj, _ = split_object_path(file_path[prefix_len:].split("/"))
+            if obj:
+                objects.add(obj)
+    return objects
@@ -0,0 +1,225 @@
+# metadata_index.py
+import os
+import json
+import sqlite3
+import hashlib
+import subprocess
+from utils.dependencies import parse_export_file
+from utils.layout import git_prefix, split_object_path
+
+# ------------------------------
+# SQLite Metadata Index
+# ------------------------------
+# One row per exported YAML file under superset_exports/ with its uuid, type,
+# object folder and content hash, plus the uuids it depends on. The index is
+# refreshed only for the files git reports as changed since the last refresh,
+# so dependency and impact queries don't have to parse the whole tree.
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,          -- relative to superset_exports/, e.g. charts/chart_1/charts/x.yaml
+                                    -- (charts/<shard>/chart_1/charts/x.yaml in the sharded layout)
+    folder TEXT NOT NULL,           -- object folder, e.g. charts/chart_1
+    uuid TEXT,
+    type TEXT,
+    is_owner INTEGER NOT NULL,      -- 1 if the folder exports this object (not a bundled dependency)
+    content_hash TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_uuid ON files (uuid);
+CREATE INDEX IF NOT EXISTS files_folder ON files (folder);
+CREATE TABLE IF NOT EXISTS deps (
+    path TEXT NOT NULL,
+    dep_uuid TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS deps_path ON deps (path);
+CREATE INDEX IF NOT EXISTS deps_dep_uuid ON deps (dep_uuid);
+"""
+
+
+class MetadataIndex:
+    """Persistent index of the export repository (see module comment)"""
+
+    def __init__(self, repo_root, exports_dir, db_path=None):
+        self.repo_root = os.path.abspath(repo_root)
+        self.exports_dir = os.path.abspath(exports_dir)
+        # git reports paths relative to the repo root with "/" separators
+        self.git_prefix = git_prefix(self.repo_root, self.exports_dir)
+        self.db_path = db_path or os.path.join(self.repo_root, ".superset_index.sqlite")
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- refresh ----------
+
+    def refresh(self):
+        """
+        Brings the index up to date. Does a full scan on first use (or if the last
+        indexed commit is gone), otherwise re-reads only the files git reports as
+        changed since the last refresh. Returns the number of files re-indexed.
+        """
+        head = self._git(["rev-parse", "HEAD"]).strip()
+        indexed_commit = self._get_meta("indexed_commit")
+        previously_dirty = json.loads(self._get_meta("dirty_paths") or "[]")
+
+        dirty = self._dirty_paths()
+        if indexed_commit:
+            try:
+                # --no-renames lists both sides of a move (e.g. a layout migration)
+                committed = self._git(
+                    ["diff", "--name-only", "--no-renames", indexed_commit, head, "--", self.git_prefix]
+                )
+            except subprocess.CalledProcessError:
+                indexed_commit = None
+        if not indexed_commit:
+            count = self._full_rebuild()
+        else:
+            paths = set(previously_dirty) | set(dirty)
+            for line in committed.splitlines():
+                if line.startswith(self.git_prefix):
+                    paths.add(line[len(self.git_prefix):])
+            count = sum(self._refresh_path(path) for path in sorted(paths))
+
+        self._set_meta("indexed_commit", head)
+        # Dirty files are re-checked next time, in case they are reverted
+        self._set_meta("dirty_paths", json.dumps(sorted(dirty)))
+        self.conn.commit()
+        return count
+
+    def _full_rebuild(self):
+        self.conn.execute("DELETE FROM files")
+        self.conn.execute("DELETE FROM deps")
+        count = 0
+        for root, _, files in os.walk(self.exports_dir):
+            for file_name in files:
+                path = os.path.relpath(os.path.join(root, file_name), self.exports_dir).replace(os.sep, "/")
+                count += self._refresh_path(path)
+        return count
+
+    def _refresh_path(self, path):
+        """Re-indexes one file (or drops it if deleted). Returns 1 if the row changed"""
+        parts = path.split("/")
+        if not path.endswith(".yaml") or parts[-1] == "metadata.yaml":
+            return 0
+        obj, member_parts = split_object_path(parts[1:])
+        if not obj or not member_parts:
+            return 0
+
+        full_path = os.path.join(self.exports_dir, *parts)
+        if not os.path.isfile(full_path):
+            self._delete_path(path)
+            return 1
+
+        with open(full_path, "rb") as f:
+            raw = f.read()
+        content_hash = hashlib.sha1(raw).hexdigest()
+        row = self.conn.execute("SELECT content_hash FROM files WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == content_hash:
+            return 0
+
+        folder = f"{parts[0]}/{obj}"
+        member_path = "/".join(member_parts)
+        parsed = parse_export_file(member_path, raw.decode("utf-8"))
+        obj_uuid, object_type, deps = parsed if parsed else (None, None, set())
+
+        self._delete_path(path)
+        self.conn.execute(
+            "INSERT INTO files (path, folder, uuid, type, is_owner, content_hash) VALUES (?, ?, ?, ?, ?, ?)",
+            (path, folder, obj_uuid, object_type, int(member_parts[0] == parts[0]), content_hash)
+        )
+        self.conn.executemany("INSERT INTO deps (path, dep_uuid) VALUES (?, ?)", [(path, d) for d in deps])
+        return 1
+
+    def _delete_path(self, path):
+        self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+        self.conn.execute("DELETE FROM deps WHERE path = ?", (path,))
+
+    def _dirty_paths(self):
+        """Paths under superset_exports/ that are modified, staged or untracked"""
+        output = self._git(["status", "--porcelain", "--untracked-files=all", "--", self.git_prefix])
+        paths = set()
+        for line in output.splitlines():
+            # "XY path" or "XY old -> new" for renames
+            for file_path in line[3:].split(" -> "):
+                if file_path.startswith(self.git_prefix):
+                    paths.add(file_path[len(self.git_prefix):])
+        return sorted(paths)
+
+    def _git(self, args):
+        return subprocess.check_output(["git"] + args, cwd=self.repo_root, text=True)
+
+    def _get_meta(self, key):
+        row = self.conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key, value):
+        self.conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    # ---------- queries ----------
+
+    def folder_of(self, obj_uuid):
+        """Returns the object folder that exports obj_uuid (e.g. charts/chart_1), or None"""
+        row = self.conn.execute(
+            "SELECT folder FROM files WHERE uuid = ? AND is_owner = 1", (obj_uuid,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def dependents(self, obj_uuid):
+        """Returns the object folders that directly depend on obj_uuid"""
+        rows = self.conn.execute(
+            "SELECT DISTINCT f.folder FROM deps d JOIN files f ON f.path = d.path "
+            "WHERE d.dep_uuid = ? AND f.is_owner = 1", (obj_uuid,)
+        )
+        return {row[0] for row in rows}
+
+    def impacted_folders(self, folders):
+        """
+        Returns the object folders transitively depending on the objects exported by
+        `folders` (e.g. a changed dataset -> its charts -> their dashboards),
+        excluding `folders` themselves.
+        """
+        folders = sorted(set(folders))
+        if not folders:
+            return set()
+        placeholders = ",".join("?" * len(folders))
+        rows = self.conn.execute(f"""
+            WITH RECURSIVE impacted(uuid) AS (
+                SELECT uuid FROM files WHERE is_owner = 1 AND folder IN ({placeholders})
+                UNION
+                SELECT f.uuid FROM deps d
+                JOIN files f ON f.path = d.path AND f.is_owner = 1
+                JOIN impacted i ON d.dep_uuid = i.uuid
+            )
+            SELECT DISTINCT folder FROM files
+            WHERE is_owner = 1 AND uuid IN (SELECT uuid FROM impacted)
+        """, folders)
+        return {row[0] for row in rows} - set(folders)
+
+
+def find_impacted_objects(repo_root, exports_dir, changed):
+    """
+    Refreshes the index and returns the objects impacted by `changed`.
+
+    Args:
+        changed (dict): {"datasets": set(folders), "charts": ..., "dashboards": ...}
+    Returns:
+        dict: Same shape, holding only the impacted objects not already in `changed`.
+    """
+    index = MetadataIndex(repo_root, exports_dir)
+    try:
+        refreshed = index.refresh()
+        print(f"🗂️ Metadata index refreshed ({refreshed} file(s) re-indexed)")
+        changed_folders = {f"{type_dir}/{folder}" for type_dir, folders in changed.items() for folder in folders}
+        impacted = {}
+        for folder in sorted(index.impacted_folders(changed_folders)):
+            type_dir, obj = folder.split("/", 1)
+            impacted.setdefault(type_dir, set()).add(obj)
+            print(f"🔗 {folder} is impacted by a changed dependency")
+        return impacted
+    finally:
+        index.close()
@@ -0,0 +1,325 @@
+# normalization.py
+import os
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+import yaml
+
+# ------------------------------
+# Normalization Rule Engine
+# ------------------------------
+# Rules can be overridden with a YAML (or JSON) file named by SUPERSET_NORMALIZE_RULES:
+#
+#   remove_lines:            # full-line regexes dropped before comparing
+#     - '^\s*annotation_layers:\s*\[\]\s*$'
+#   json_fields:             # fields whose JSON string value is compacted and key-sorted
+#     - query_context
+#   collapse_blank_lines: true
+
+DEFAULT_RULES = {
+    # Default empty fields commonly added by Superset, ignored when comparing exports
+    "remove_lines": [
+        r'^\s*annotation_layers:\s*\[\]\s*$',
+        r'^\s*adhoc_filters:\s*\[\]\s*$',
+        r'^\s*dashboards:\s*\[\]\s*$',
+        r'^\s*extra_form_data:\s*\{\}\s*$',
+    ],
+    # Superset exports these in different formats (compact vs pretty-printed)
+    "json_fields": ["query_context"],
+    "collapse_blank_lines": True,
+}
+
+JSON_END_RE = re.compile(r'\}\'?\s*$')
+
+
+def normalize_json_block(json_lines, value_re):
+    """
+    Normalizes one JSON field spanning json_lines into its compact, key-sorted form.
+    value_re splits the block into (prefix, json, suffix).
+    Returns the resulting lines (the original lines if the JSON can't be parsed).
+    """
+    # Join the JSON lines and extract the JSON part
+    match = value_re.match('\n'.join(json_lines))
+    if not match:
+        # If regex doesn't match, keep the original
+        return json_lines
+
+    prefix, json_str, suffix = match.groups()
+
+    # Clean up the JSON string - remove any trailing quotes that might be part of the JSON
+    if json_str.endswith("'}'"):
+        json_str = json_str[:-2] + "}"
+    elif json_str.endswith("'}"):
+        json_str = json_str[:-1] + "}"
+
+    try:
+        # sort_keys sorts nested objects too, so the output is fully canonical
+        normalized_json = json.dumps(json.loads(json_str), separators=(',', ':'), sort_keys=True)
+    except json.JSONDecodeError:
+        # If JSON parsing fails, keep the original
+        return json_lines
+
+    # Reconstruct the line with normalized JSON
+    return [prefix + normalized_json + suffix]
+
+
+class NormalizationRules:
+    """
+    Normalization rules compiled once: every line filter becomes one combined
+    regex, and line filtering, JSON canonicalization and blank-line collapsing
+    run in a single pass over the lines.
+    """
+
+    def __init__(self, remove_lines=None, json_fields=None, collapse_blank_lines=True):
+        self.remove_lines = list(DEFAULT_RULES["remove_lines"] if remove_lines is None else remove_lines)
+        self.json_fields = list(DEFAULT_RULES["json_fields"] if json_fields is None else json_fields)
+        self.collapse_blank_lines = collapse_blank_lines
+
+        self.remove_re = re.compile("|".join(f"(?:{p})" for p in self.remove_lines)) if self.remove_lines else None
+        fields = "|".join(re.escape(field) for field in self.json_fields)
+        self.json_start_re = re.compile(rf'^\s*(?:{fields}):\s*\'?\{{') if fields else None
+        self.json_value_re = re.compile(rf'^(\s*(?:{fields}):\s*\'?)(.*?)(\'?\s*)$', re.DOTALL) if fields else None
+
+    @classmethod
+    def from_file(cls, path):
+        """Loads rules from a YAML/JSON file; missing keys fall back to the defaults"""
+        with open(path) as f:
+            config = yaml.safe_load(f) or {}
+        return cls(
+            remove_lines=config.get("remove_lines"),
+            json_fields=config.get("json_fields"),
+            collapse_blank_lines=config.get("collapse_blank_lines", True),
+        )
+
+    def fingerprint(self):
+        """Stable string identifying these rules (e.g. for cache keys)"""
+        return json.dumps([self.remove_lines, self.json_fields, self.collapse_blank_lines])
+
+    def iter_lines(self, lines):
+        """
+        Consumes an iterable of lines (a list, or an open file) and yields the
+        normalized lines without their newline. Only one JSON block is held in
+        memory at a time.
+        """
+        remove_match = self.remove_re.match if self.remove_re else None
+        json_start_match = self.json_start_re.match if self.json_start_re else None
+        json_end_search = JSON_END_RE.search
+        collapse = self.collapse_blank_lines
+
+        json_lines = None
+        pending_blank = 0
+        emitted = False
+
+        def emit(out_lines):
+            nonlocal pending_blank, emitted
+            for out_line in out_lines:
+                if not out_line:
+                    pending_blank += 1
+                    continue
+                if pending_blank:
+                    # Runs of blank lines collapse to one (two at the very start)
+                    if collapse:
+                        pending_blank = min(pending_blank, 1 if emitted else 2)
+                    yield from [""] * pending_blank
+                    pending_blank = 0
+                emitted = True
+                yield out_line
+
+        for raw_line in lines:
+            for line in raw_line.splitlines():
+                line = line.rstrip()
+                if remove_match and remove_match(line):
+                    continue
+
+                if json_lines is not None:
+                    json_lines.append(line)
+                    if json_end_search(line):
+                        yield from emit(normalize_json_block(json_lines, self.json_value_re))
+                        json_lines = None
+                elif json_start_match and "{" in line and json_start_match(line):
+                    if json_end_search(line):
+                        yield from emit(normalize_json_block([line], self.json_value_re))
+                    else:
+                        json_lines = [line]
+                elif line:
+                    # Fast path for the common case of a plain, non-blank line
+                    if pending_blank:
+                        yield from emit((line,))
+                    else:
+                        emitted = True
+                        yield line
+                else:
+                    pending_blank += 1
+
+        if json_lines is not None:
+            yield from emit(normalize_json_block(json_lines, self.json_value_re))
+        # Trailing blank lines are dropped
+
+    def normalize(self, content):
+        """Normalizes YAML content; the result ends with a single newline if non-empty"""
+        if not content:
+            return content
+        normalized = "\n".join(self.iter_lines(content.splitlines(keepends=True)))
+        return normalized + "\n" if normalized else normalized
+
+
+_default_rules = None
+
+
+def get_normalization_rules():
+    """Returns the rules in use: SUPERSET_NORMALIZE_RULES if set, else the defaults (compiled once)"""
+    global _default_rules
+    if _default_rules is None:
+        rules_path = os.environ.get("SUPERSET_NORMALIZE_RULES")
+        _default_rules = NormalizationRules.from_file(rules_path) if rules_path else NormalizationRules()
+    return _default_rules
+
+
+# ------------------------------
+# Normalization Cache
+# ------------------------------
+# The same YAML (shared databases/*.yaml, datasets bundled with many charts, files
+# already on disk) is normalized over and over. Results are memoized by a hash of
+# the raw text and the rules in use: an in-process LRU bounded by size, plus an
+# optional on-disk tier (SUPERSET_NORMALIZE_CACHE_DIR) that persists across runs.
+
+class NormalizationCache:
+    """Size-bounded memoization of NormalizationRules.normalize (see section comment)"""
+
+    def __init__(self, rules, max_bytes=64 * 1024 * 1024, disk_dir=None, max_disk_bytes=512 * 1024 * 1024):
+        self.rules = rules
+        self.rules_key = hashlib.blake2b(rules.fingerprint().encode("utf-8"), digest_size=8).digest()
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()  # key -> normalized content, least recently used first
+        self.size = 0
+        self.disk_size = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+            self.disk_size = sum(entry.stat().st_size for entry in os.scandir(disk_dir) if entry.is_file())
+
+    def key(self, content):
+        return hashlib.blake2b(content.encode("utf-8"), digest_size=16, key=self.rules_key).hexdigest()
+
+    def normalize(self, content):
+        if not content:
+            return content
+        key = self.key(content)
+
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.memory_hits += 1
+                return self.entries[key]
+
+        normalized = self._disk_get(key)
+        if normalized is not None:
+            with self.lock:
+                self.disk_hits += 1
+        else:
+            normalized = self.rules.normalize(content)
+            with self.lock:
+                self.misses += 1
+            self._disk_put(key, normalized)
+
+        self._memory_put(key, normalized)
+        return normalized
+
+    def _memory_put(self, key, normalized):
+        entry_size = len(normalized)
+        if entry_size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                return
+            self.entries[key] = normalized
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= len(evicted)
+
+    def _disk_get(self, key):
+        if not self.disk_dir:
+            return None
+        path = os.path.join(self.disk_dir, key)
+        try:
+            with open(path, encoding="utf-8", newline="") as f:
+                normalized = f.read()
+            os.utime(path)  # mark as recently used for eviction
+            return normalized
+        except OSError:
+            return None
+
+    def _disk_put(self, key, normalized):
+        if not self.disk_dir:
+            return
+        data = normalized.encode("utf-8")
+        if len(data) > self.max_disk_bytes:
+            return
+        path = os.path.join(self.disk_dir, key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError:
+            return
+        with self.lock:
+            self.disk_size += len(data)
+            if self.disk_size > self.max_disk_bytes:
+                self._evict_disk()
+
+    def _evict_disk(self):
+        """Removes least recently used files until the disk tier is back to 80% of its budget"""
+        files = sorted(
+            (entry for entry in os.scandir(self.disk_dir) if entry.is_file()),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        self.disk_size = sum(entry.stat().st_size for entry in files)
+        for entry in files:
+            if self.disk_size <= self.max_disk_bytes * 0.8:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.disk_size -= size
+            except OSError:
+                pass
+
+    def summary(self):
+        total = self.memory_hits + self.disk_hits + self.misses
+        hit_rate = (self.memory_hits + self.disk_hits) / total * 100 if total else 0.0
+        return (
+            f"{self.memory_hits} memory hit(s), {self.disk_hits} disk hit(s), "
+            f"{self.misses} miss(es) ({hit_rate:.0f}% hit rate)"
+        )
+
+
+_default_cache = None
+
+
+def get_normalization_cache():
+    """
+    Returns the cache in front of the configured rules, or None if disabled.
+    SUPERSET_NORMALIZE_CACHE_MB sizes the in-process tier (0 disables caching);
+    SUPERSET_NORMALIZE_CACHE_DIR / SUPERSET_NORMALIZE_DISK_CACHE_MB enable and size the disk tier.
+    """
+    global _default_cache
+    if _default_cache is None:
+        max_mb = float(os.environ.get("SUPERSET_NORMALIZE_CACHE_MB", "64"))
+        if max_mb <= 0:
+            return None
+        _default_cache = NormalizationCache(
+            get_normalization_rules(),
+            max_bytes=int(max_mb * 1024 * 1024),
+            disk_dir=os.environ.get("SUPERSET_NORMALIZE_CACHE_DIR") or None,
+            max_disk_bytes=int(float(os.environ.get("SUPERSET_NORMALIZE_DISK_CACHE_MB", "512")) * 1024 * 1024),
+        )
+    return _default_cache
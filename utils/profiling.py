@@ -0,0 +1,154 @@
+# profiling.py
+import os
+import sys
+import json
+import time
+import atexit
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+# ------------------------------
+# Opt-in Run Profiling
+# ------------------------------
+# Enabled with SUPERSET_PROFILE=1 or a --profile flag. Writes into
+# <SUPERSET_PROFILE_DIR or cwd>/superset_profile_<script>_<timestamp>/:
+#   cprofile.prof        cProfile dump of the main thread (open with pstats / snakeviz)
+#   tracemalloc_top.txt  top allocation sites at the end of the run
+#   wall_clock.json      sampled wall-clock split into HTTP wait, git, zip, normalization
+
+PROFILE_ENABLED = os.environ.get("SUPERSET_PROFILE", "0") == "1" or "--profile" in sys.argv
+PROFILE_DIR = os.environ.get("SUPERSET_PROFILE_DIR", os.getcwd())
+SAMPLE_INTERVAL = float(os.environ.get("SUPERSET_PROFILE_INTERVAL_MS", "10")) / 1000
+TRACEMALLOC_TOP = 25
+
+# First match walking a stack from the innermost frame outwards decides the category
+SAMPLE_CATEGORIES = [
+    ("normalization", ("utils/normalization.py",)),
+    ("http_wait", ("/requests/", "/urllib3/", "/http/client.py", "/socket.py", "/ssl.py")),
+    ("git_subprocess", ("/subprocess.py",)),
+    ("zip", ("/zipfile.py", "/zipfile/", "/shutil.py")),
+]
+IDLE_FILES = ("/threading.py", "/queue.py", "/concurrent/futures/")
+IMPORT_FRAME = "<frozen importlib"
+
+
+def classify_stack(frame):
+    """Returns the category of one sampled stack"""
+    filenames = []
+    while frame is not None:
+        filenames.append(frame.f_code.co_filename.replace(os.sep, "/"))
+        frame = frame.f_back
+    # Frames below importlib are module code running at import time (e.g. importing
+    # requests is not HTTP wait): classify from the code that triggered the import
+    for i in range(len(filenames) - 1, -1, -1):
+        if filenames[i].startswith(IMPORT_FRAME):
+            filenames = filenames[i + 1:]
+            break
+    for filename in filenames:
+        for category, markers in SAMPLE_CATEGORIES:
+            if any(marker in filename for marker in markers):
+                return category
+    if filenames and any(marker in filenames[0] for marker in IDLE_FILES):
+        return "idle"
+    return "other"
+
+
+class WallClockSampler(threading.Thread):
+    """
+    Samples every thread's stack at a fixed interval and adds the wall-clock time
+    since the previous sample to each thread's category. The sampler wakes up late
+    under GIL contention, so the measured gap is used rather than the interval.
+    """
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        super().__init__(name="superset-profile-sampler", daemon=True)
+        self.interval = interval
+        self.seconds = Counter()
+        self.main_thread_seconds = Counter()
+        self.samples = 0
+        self.stopped = threading.Event()
+
+    def run(self):
+        main_id = threading.main_thread().ident
+        last = time.monotonic()
+        while not self.stopped.wait(self.interval):
+            now = time.monotonic()
+            elapsed, last = now - last, now
+            self.samples += 1
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == self.ident:
+                    continue
+                category = classify_stack(frame)
+                self.seconds[category] += elapsed
+                if thread_id == main_id:
+                    self.main_thread_seconds[category] += elapsed
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+    def breakdown(self):
+        def seconds(counter):
+            return {category: round(value, 3) for category, value in counter.most_common()}
+        return {
+            "interval_seconds": self.interval,
+            "samples": self.samples,
+            "main_thread_seconds": seconds(self.main_thread_seconds),
+            "all_threads_seconds": seconds(self.seconds),
+        }
+
+
+class RunProfiler:
+    """cProfile + tracemalloc + wall-clock sampler for one script run"""
+
+    def __init__(self, name):
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.output_dir = os.path.join(PROFILE_DIR, f"superset_profile_{name}_{timestamp}")
+        self.profiler = cProfile.Profile()
+        self.sampler = WallClockSampler()
+        self.started = None
+
+    def start(self):
+        self.started = time.monotonic()
+        tracemalloc.start(10)
+        self.sampler.start()
+        self.profiler.enable()
+
+    def stop(self):
+        self.profiler.disable()
+        self.sampler.stop()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+        elapsed = time.monotonic() - self.started
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        self.profiler.dump_stats(os.path.join(self.output_dir, "cprofile.prof"))
+
+        with open(os.path.join(self.output_dir, "tracemalloc_top.txt"), "w") as f:
+            for stat in snapshot.statistics("lineno")[:TRACEMALLOC_TOP]:
+                f.write(f"{stat}\n")
+
+        breakdown = self.sampler.breakdown()
+        breakdown["elapsed_seconds"] = round(elapsed, 3)
+        with open(os.path.join(self.output_dir, "wall_clock.json"), "w") as f:
+            json.dump(breakdown, f, indent=2)
+
+        main = ", ".join(f"{k}={v:.1f}s" for k, v in breakdown["main_thread_seconds"].items())
+        print(f"\n⏱️ Profile written to {self.output_dir} ({elapsed:.1f}s; main thread: {main})")
+
+
+def start_profiling(name):
+    """
+    Starts profiling the current run if enabled and writes the results at exit
+    (including exit() calls). Returns the RunProfiler, or None if disabled.
+    """
+    if not PROFILE_ENABLED:
+        return None
+    run_profiler = RunProfiler(name)
+    run_profiler.start()
+    atexit.register(run_profiler.stop)
+    print(f"⏱️ Profiling enabled, output: {run_profiler.output_dir}")
+    return run_profiler
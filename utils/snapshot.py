@@ -0,0 +1,189 @@
+# snapshot.py
+import os
+import json
+import shutil
+import zipfile
+import tempfile
+from datetime import datetime, timezone
+from utils.dependencies import parse_export_file
+
+# ------------------------------
+# Snapshot Archive
+# ------------------------------
+# A snapshot is one zip file holding every exported object of an instance once,
+# stored by uuid with the original export bytes:
+#
+#   index.json              table of contents: {uuid: {type, path, member, deps}}
+#   objects/<uuid>.yaml     raw YAML as exported by Superset
+#
+# Members are compressed individually and the zip central directory gives random
+# access, so any subset can be read without decompressing the whole file.
+
+SNAPSHOT_VERSION = 1
+TOC_NAME = "index.json"
+
+# metadata.yaml `type` Superset expects per import endpoint
+IMPORT_METADATA_TYPES = {
+    "dataset": "SqlaTable",
+    "chart": "Slice",
+    "dashboard": "Dashboard",
+}
+
+
+class SnapshotWriter:
+    """Writes a snapshot, keeping the first copy of each uuid"""
+
+    def __init__(self, path, source=None):
+        self.path = path
+        self.zip = zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED)
+        self.toc = {
+            "version": SNAPSHOT_VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "source": source,
+            "objects": {},
+        }
+        self.duplicates = 0
+
+    def add_member(self, member_path, raw):
+        """
+        Adds one exported file (bundle path without the top-level folder, raw bytes).
+        The bytes are stored as-is; they are only parsed to read uuid and deps.
+        Returns True if it was a new object.
+        """
+        parsed = parse_export_file(member_path, raw.decode("utf-8"))
+        if not parsed:
+            return False
+        obj_uuid, object_type, deps = parsed
+        if obj_uuid in self.toc["objects"]:
+            self.duplicates += 1
+            return False
+        member = f"objects/{obj_uuid}.yaml"
+        self.zip.writestr(member, raw)
+        self.toc["objects"][obj_uuid] = {
+            "type": object_type,
+            "path": member_path,
+            "member": member,
+            "deps": sorted(deps),
+        }
+        return True
+
+    def add_export_zip(self, export_zip):
+        """Adds every object of a Superset export zip (a zipfile.ZipFile). Returns the number added"""
+        added = 0
+        for name in export_zip.namelist():
+            _, _, member_path = name.partition("/")
+            if not member_path or not member_path.endswith(".yaml") or member_path == "metadata.yaml":
+                continue
+            added += self.add_member(member_path, export_zip.read(name))
+        return added
+
+    def close(self):
+        self.zip.writestr(TOC_NAME, json.dumps(self.toc, indent=1, sort_keys=True))
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SnapshotReader:
+    """Random-access reader for a snapshot file"""
+
+    def __init__(self, path):
+        self.path = path
+        self.zip = zipfile.ZipFile(path)
+        self.toc = json.loads(self.zip.read(TOC_NAME))
+        self.objects = self.toc["objects"]
+
+    def uuids_of_type(self, object_type):
+        return sorted(u for u, obj in self.objects.items() if obj["type"] == object_type)
+
+    def closure(self, uuids):
+        """Returns the given uuids plus everything they transitively depend on"""
+        seen = set()
+        stack = list(uuids)
+        while stack:
+            current = stack.pop()
+            if current in seen or current not in self.objects:
+                continue
+            seen.add(current)
+            stack.extend(self.objects[current]["deps"])
+        return seen
+
+    def open_object(self, obj_uuid):
+        """Opens the raw bytes of one object as a stream"""
+        return self.zip.open(self.objects[obj_uuid]["member"])
+
+    def write_import_bundle(self, root_uuids, resource, fileobj):
+        """
+        Writes an import zip for `resource` holding root_uuids and their closure,
+        streaming each member from the snapshot. Returns the number of objects written.
+        """
+        prefix = f"snapshot_{resource}_import"
+        members = self.closure(root_uuids)
+        used_paths = {}
+        with zipfile.ZipFile(fileobj, "w", zipfile.ZIP_DEFLATED) as bundle:
+            bundle.writestr(f"{prefix}/metadata.yaml", (
+                "version: 1.0.0\n"
+                f"type: {IMPORT_METADATA_TYPES[resource]}\n"
+                f"timestamp: '{datetime.now(timezone.utc).isoformat()}'\n"
+            ))
+            for obj_uuid in sorted(members):
+                path = self.objects[obj_uuid]["path"]
+                # Two objects can share an export path (e.g. same table name); keep both
+                if used_paths.get(path, obj_uuid) != obj_uuid:
+                    base, ext = os.path.splitext(path)
+                    path = f"{base}_{obj_uuid[:8]}{ext}"
+                used_paths[path] = obj_uuid
+                with self.open_object(obj_uuid) as src, bundle.open(f"{prefix}/{path}", "w") as dst:
+                    shutil.copyfileobj(src, dst)
+        return len(members)
+
+    def close(self):
+        self.zip.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def plan_restore(reader, uuids=None):
+    """
+    Groups the objects to restore into import roots per resource, datasets first.
+    Superset only overwrites the root objects of an import bundle; the charts,
+    datasets and databases bundled with them are created if missing but never
+    updated. So every chart and dataset is its own root, otherwise restoring
+    onto an instance that already has them (e.g. a rollback) would keep the
+    current versions.
+    Returns [(resource, [root uuids])].
+    """
+    wanted = reader.closure(uuids) if uuids else set(reader.objects)
+    plan = []
+    for resource in ("dataset", "chart", "dashboard"):
+        roots = [u for u in reader.uuids_of_type(resource) if u in wanted]
+        if roots:
+            plan.append((resource, roots))
+    return plan
+
+
+def iter_restore_batches(reader, uuids=None, batch_size=50):
+    """
+    Yields (resource, zip path, object count) for each batched import bundle.
+    Each bundle is written to a temp file just before it is yielded.
+    """
+    tmp_dir = tempfile.mkdtemp(prefix="superset_restore_")
+    try:
+        for resource, roots in plan_restore(reader, uuids):
+            for start in range(0, len(roots), batch_size):
+                batch = roots[start:start + batch_size]
+                zip_path = os.path.join(tmp_dir, f"{resource}_{start // batch_size + 1}.zip")
+                with open(zip_path, "wb") as f:
+                    count = reader.write_import_bundle(batch, resource, f)
+                yield resource, zip_path, count
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
@@ -1,10 +1,19 @@
 # superset_utils.py
 import os
+import sys
 import subprocess
 import zipfile
 import requests
 import re
-import json
+import hashlib
+import io
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, quote_plus
+from utils.dependencies import BUNDLE_TYPES, parse_export_file
+from utils.adaptive import AdaptiveSession
+from utils.layout import layout_for_type_dir, git_prefix, objects_from_git_paths, split_object_path
+from utils.normalization import get_normalization_cache, get_normalization_rules
 
 # ------------------------------
 # Git / File Handling Functions
@@ -17,40 +26,29 @@ def find_changed_objects(repo_root, base_dir):
     """
     changed_dirs = set()
     try:
-        abs_base_dir = os.path.abspath(base_dir)
+        prefix = git_prefix(repo_root, base_dir)
 
         # 1. Get modified/changed files (staged or unstaged)
         git_status_output = subprocess.check_output(
-            ["git", "status", "--porcelain"],
+            ["git", "status", "--porcelain", "--", prefix],
             cwd=repo_root,
             text=True
         )
 
+        file_paths = []
         for line in git_status_output.splitlines():
             parts = line.strip().split()
             if len(parts) > 1:
-                file_path = parts[-1]  # last element is always the file path
-                abs_file_path = os.path.abspath(os.path.join(repo_root, file_path))
-
-                if abs_file_path.startswith(abs_base_dir + os.sep):
-                    rel_path = os.path.relpath(abs_file_path, abs_base_dir)
-                    obj_folder = rel_path.split(os.sep)[0]
-                    changed_dirs.add(obj_folder)
+                file_paths.append(parts[-1])  # last element is always the file path
+        changed_dirs |= objects_from_git_paths(file_paths, prefix)
 
         # 2. Get untracked (new) files
         git_untracked_output = subprocess.check_output(
-            ["git", "ls-files", "--others", "--exclude-standard"],
+            ["git", "ls-files", "--others", "--exclude-standard", "--", prefix],
             cwd=repo_root,
             text=True
         )
-
-        for file_path in git_untracked_output.splitlines():
-            abs_file_path = os.path.abspath(os.path.join(repo_root, file_path))
-
-            if abs_file_path.startswith(abs_base_dir + os.sep):
-                rel_path = os.path.relpath(abs_file_path, abs_base_dir)
-                obj_folder = rel_path.split(os.sep)[0]
-                changed_dirs.add(obj_folder)
+        changed_dirs |= objects_from_git_paths(git_untracked_output.splitlines(), prefix)
 
     except Exception as e:
         print(f"❌ Git command failed: {e}")
@@ -58,38 +56,109 @@ def find_changed_objects(repo_root, base_dir):
     return changed_dirs
 
 
+def changed_paths_from_name_status(output):
+    """
+    Returns the paths listed by `git diff/log --name-status -M`, leaving out pure
+    renames (R100, e.g. folders moved by a layout migration): their content didn't
+    change, so there's nothing to import.
+    """
+    paths = []
+    for line in output.splitlines():
+        fields = line.split("\t")
+        if len(fields) < 2 or fields[0] == "R100":
+            continue
+        # Copies only add the new path; renames with edits touch both sides
+        paths.extend(fields[-1:] if fields[0].startswith("C") else fields[1:])
+    return paths
+
+
 def find_objects_changed_after_pull(repo_root, base_dir):
     """
     Detect directories newly added or changed after the last git pull.
     """
     changed_dirs = set()
     try:
-        abs_base_dir = os.path.abspath(base_dir)
+        prefix = git_prefix(repo_root, base_dir)
 
         # Get all files changed since the previous HEAD (before pull)
         git_diff_output = subprocess.check_output(
-            ["git", "log", "HEAD@{1}..HEAD", "--name-only", "--pretty=format:"],
+            ["git", "log", "HEAD@{1}..HEAD", "--name-status", "-M", "--pretty=format:", "--", prefix],
             cwd=repo_root,
             text=True
         )
+        changed_dirs = objects_from_git_paths(changed_paths_from_name_status(git_diff_output), prefix)
 
-        for file_path in git_diff_output.splitlines():
-            if not file_path.strip():
-                continue
-            abs_file_path = os.path.abspath(os.path.join(repo_root, file_path))
+    except Exception as e:
+        print(f"❌ Git command failed: {e}")
+
+    return changed_dirs
 
-            if abs_file_path.startswith(abs_base_dir + os.sep):
-                rel_path = os.path.relpath(abs_file_path, abs_base_dir)
-                obj_folder = rel_path.split(os.sep)[0]
-                changed_dirs.add(obj_folder)
+
+def find_objects_changed_since(repo_root, base_dir, commit):
+    """
+    Detect directories changed between `commit` and HEAD.
+    Returns None if the commit can't be compared (e.g. unknown after a force push).
+    """
+    try:
+        prefix = git_prefix(repo_root, base_dir)
+
+        git_diff_output = subprocess.check_output(
+            ["git", "diff", "--name-status", "-M", commit, "HEAD", "--", prefix],
+            cwd=repo_root,
+            text=True
+        )
 
     except Exception as e:
         print(f"❌ Git command failed: {e}")
+        return None
 
-    return changed_dirs
+    return objects_from_git_paths(changed_paths_from_name_status(git_diff_output), prefix)
 
 
-    return changed_dirs
+def find_changed_root_uuids(repo_root, exports_dir, commit):
+    """
+    Returns the uuids of the objects whose own YAML (not a copy bundled in another
+    object's folder) changed between `commit` and HEAD under exports_dir
+    (superset_exports/), or None if the commit can't be compared.
+    """
+    try:
+        prefix = git_prefix(repo_root, exports_dir)
+        git_diff_output = subprocess.check_output(
+            ["git", "diff", "--name-status", "-M", commit, "HEAD", "--", prefix],
+            cwd=repo_root,
+            text=True
+        )
+    except Exception as e:
+        print(f"❌ Git command failed: {e}")
+        return None
+
+    uuids = set()
+    for file_path in changed_paths_from_name_status(git_diff_output):
+        if not file_path.startswith(prefix) or not file_path.endswith(".yaml"):
+            continue
+        parts = file_path[len(prefix):].split("/")
+        _, member_parts = split_object_path(parts[1:])
+        # Owned by its folder if it sits under the folder's own type dir
+        if not member_parts or member_parts[0] != parts[0]:
+            continue
+        full_path = os.path.join(repo_root, *file_path.split("/"))
+        if not os.path.isfile(full_path):
+            continue
+        with open(full_path) as f:
+            parsed = parse_export_file("/".join(member_parts), f.read())
+        if parsed:
+            uuids.add(parsed[0])
+    return uuids
+
+
+def find_all_objects(base_dir):
+    """Returns every object directory inside base_dir, regardless of git changes"""
+    return layout_for_type_dir(base_dir).list_objects(base_dir)
+
+
+def get_head_commit(repo_root):
+    """Returns the commit hash HEAD points to"""
+    return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=repo_root, text=True).strip()
 
 
 
@@ -143,7 +212,7 @@ def create_zip_from_dir(object_path, output_path):
 #     print(f"--- {object_type.capitalize()}'s Zipping Process Completed ---\n")
 
 def detect_changed_object_and_create_zip(
-    repo_root, exports_dir, zips_dir, object_type, workflow="local"
+    repo_root, exports_dir, zips_dir, object_type, workflow="local", skip_objects=None, extra_objects=None
 ):
     """
     Detects changed Superset objects (dashboards/charts) and creates zip archives.
@@ -154,11 +223,14 @@ def detect_changed_object_and_create_zip(
         zips_dir (str): Absolute path to store generated zip files.
         object_type (str): Type of object ("dashboards", "charts", "datasets", etc.)
         workflow (str): "local" for local changes, "pull" for changes after git pull.
+        skip_objects (set): Object folders to leave out (e.g. already shipped inside a dashboard zip).
+        extra_objects (set): Unchanged object folders to zip as well (e.g. impacted by a changed dependency).
     """
     print(f"--- {object_type.capitalize()}'s Zipping Process Started ---")
 
     objects_root = exports_dir
     output_root = zips_dir
+    layout = layout_for_type_dir(objects_root)
     os.makedirs(output_root, exist_ok=True)
 
     # Decide which function to use based on workflow
@@ -169,13 +241,21 @@ def detect_changed_object_and_create_zip(
         # from utils.git_utils import find_changed_objects
         changed_objects = find_changed_objects(repo_root, objects_root)
 
+    changed_objects |= {
+        obj for obj in (extra_objects or set()) if os.path.isdir(layout.object_dir(objects_root, obj))
+    }
+
+    for obj in sorted(changed_objects & (skip_objects or set())):
+        print(f"🔗 {obj} is imported with its dashboard, skipping")
+    changed_objects -= skip_objects or set()
+
     if not changed_objects:
         print(f"🟠 No {object_type} changes detected.")
     else:
         print(f"📝 Found {len(changed_objects)} changed {object_type}:")
         for obj in changed_objects:
             print(f"  - {obj}")
-            object_path = os.path.join(objects_root, obj)
+            object_path = layout.object_dir(objects_root, obj)
             output_zip = os.path.join(output_root, f"{obj}.zip")
             zip_file = create_zip_from_dir(object_path, output_zip)
             if zip_file:
@@ -185,13 +265,32 @@ def detect_changed_object_and_create_zip(
 
 
 
+def get_peak_rss_mb():
+    """Returns the peak resident memory of this process in MB, or None if unavailable"""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
 # ------------------------------
 # Superset API Functions
 # ------------------------------
 
-def login_superset(url, username, password):
-    """Logs in to Superset and returns a session with the access token."""
-    session = requests.Session()
+def login_superset(url, username, password, pool_size=None, adaptive=False):
+    """
+    Logs in to Superset and returns a session with the access token.
+    pool_size sizes the session's connection pool when it is shared by several threads.
+    adaptive returns an AdaptiveSession that paces list/export/import calls (AIMD).
+    """
+    session = AdaptiveSession() if adaptive else requests.Session()
+    if pool_size:
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
     resp = session.post(f"{url}/api/v1/security/login", json={
         "username": username,
         "password": password,
@@ -206,6 +305,63 @@ def login_superset(url, username, password):
     return session
 
 
+RISON_NOT_IDCHAR = set(" '!:(),*@$")
+RISON_NOT_IDSTART = set("-0123456789")
+
+
+def rison_dumps(value):
+    """
+    Encodes a Python value as Rison, the query format used by the Superset REST API
+    (e.g. {"page": 0, "filters": [...]} -> (filters:!(...),page:0)).
+    """
+    if value is None:
+        return "!n"
+    if value is True:
+        return "!t"
+    if value is False:
+        return "!f"
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, dict):
+        return "(" + ",".join(
+            f"{rison_dumps(str(k))}:{rison_dumps(v)}" for k, v in value.items()
+        ) + ")"
+    if isinstance(value, (list, tuple, set)):
+        return "!(" + ",".join(rison_dumps(item) for item in value) + ")"
+
+    value = str(value)
+    if value and value[0] not in RISON_NOT_IDSTART and not any(c in RISON_NOT_IDCHAR for c in value):
+        return value
+    return "'" + value.replace("!", "!!").replace("'", "!'") + "'"
+
+
+def get_superset_items(session, url, endpoint, filters=None):
+    """Fetch items from Superset API with pagination, optionally narrowed by rison filters"""
+    items = []
+    page = 0
+    page_size = 100
+    
+    print("\n===============")
+    print(f"\n📋 Fetching {endpoint} list from Superset...")
+    
+    while True:
+        query = {"page": page, "page_size": page_size}
+        if filters:
+            query["filters"] = filters
+        resp = session.get(f"{url}/api/v1/{endpoint}/?q={quote_plus(rison_dumps(query))}")
+        if resp.status_code != 200:
+            print(f"❌ Failed to fetch {endpoint}: {resp.status_code}")
+            return []
+        data = resp.json()
+        results = data.get("result", [])
+        items.extend(results)
+        if len(results) < page_size:
+            break
+        page += 1
+    print(f"✅ Total {endpoint} fetched: {len(items)}")
+    return items
+
+
 def get_csrf_token(session, url):
     """Fetches CSRF token from Superset API."""
     try:
@@ -217,10 +373,22 @@ def get_csrf_token(session, url):
         return None
 
 
-def import_zip(session, prod_url, zip_path, resource="dashboard"):
+def delete_zip(zip_path):
+    """Deletes an imported zip file. Returns True if it was removed"""
+    zip_name = os.path.basename(zip_path)
+    try:
+        os.remove(zip_path)
+        print(f"🗑️ Deleted zip file: {zip_name}")
+        return True
+    except Exception as e:
+        print(f"❌ Failed to delete zip file {zip_name}: {e}")
+        return False
+
+
+def import_zip(session, prod_url, zip_path, resource="dashboard", delete_on_success=True):
     """
     Imports a Superset object (dashboard/chart) zip file to Superset
-    and deletes the zip if import succeeds.
+    and deletes the zip if import succeeds (unless delete_on_success is False).
     """
     zip_name = os.path.basename(zip_path)
     print(f"⬆️ Importing {zip_name} as {resource} ...")
@@ -239,13 +407,9 @@ def import_zip(session, prod_url, zip_path, resource="dashboard"):
 
         if resp.status_code == 200:
             print(f"✅ Successfully imported {zip_name}")
-            try:
-                os.remove(zip_path)
-                print(f"🗑️ Deleted zip file: {zip_name}")
-                return True, True
-            except Exception as e:
-                print(f"❌ Failed to delete zip file {zip_name}: {e}")
+            if not delete_on_success:
                 return True, False
+            return True, delete_zip(zip_path)
         else:
             print(f"❌ Failed to import {zip_name}: {resp.status_code}")
             print(resp.text)
@@ -256,132 +420,247 @@ def import_zip(session, prod_url, zip_path, resource="dashboard"):
 
 
 # ------------------------------
-# YAML Normalization Functions
+# Import Verification Functions
 # ------------------------------
 
-def deep_sort_json(obj):
-    """Recursively sort all keys in a JSON object for consistent ordering"""
-    if isinstance(obj, dict):
-        return {k: deep_sort_json(v) for k, v in sorted(obj.items())}
-    elif isinstance(obj, list):
-        return [deep_sort_json(item) for item in obj]
-    else:
-        return obj
+VERIFY_BATCH_SIZE = 100
+VERIFIED_RESOURCES = ("dataset", "chart", "dashboard")
 
 
-def normalize_json_in_yaml(content):
-    """Normalize JSON formatting within YAML content, particularly for query_context fields"""
-    lines = content.splitlines()
-    normalized_lines = []
-    i = 0
-    
-    while i < len(lines):
-        line = lines[i]
-        
-        # Check if this line starts a query_context field
-        if re.match(r'^\s*query_context:\s*\'?\{', line):
-            # Find the complete JSON string (may span multiple lines)
-            json_lines = [line]
-            
-            # Check if the JSON is complete on this single line
-            if re.search(r'\}\'?\s*$', line):
-                # JSON is complete on this line
-                pass
-            else:
-                # JSON spans multiple lines, collect them
-                i += 1
-                while i < len(lines):
-                    current_line = lines[i]
-                    json_lines.append(current_line)
-                    
-                    # Check if this line ends the JSON string
-                    if re.search(r'\}\'?\s*$', current_line):
+def build_bundle_manifest(zip_path, resources=VERIFIED_RESOURCES):
+    """
+    Lists the object uuids shipped in an import zip, read from the top-level
+    `uuid:` line of each YAML member. Returns {"dataset": set(), "chart": ..., "dashboard": ...}
+    (or the given resources).
+    """
+    manifest = {}
+    with zipfile.ZipFile(zip_path) as z:
+        for name in z.namelist():
+            # <object folder>/<type>s/.../<file>.yaml
+            parts = name.split("/")
+            if len(parts) < 3 or not name.endswith(".yaml"):
+                continue
+            resource = BUNDLE_TYPES.get(parts[1])
+            if resource not in resources:
+                continue
+            with z.open(name) as f:
+                for line in io.TextIOWrapper(f, encoding="utf-8"):
+                    match = re.match(r"^uuid:\s*'?([0-9a-fA-F-]+)'?\s*$", line)
+                    if match:
+                        manifest.setdefault(resource, set()).add(match.group(1))
                         break
-                    i += 1
-            
-            # Join the JSON lines and extract the JSON part
-            json_text = '\n'.join(json_lines)
-            
-            # Extract the JSON string from the YAML line
-            match = re.match(r'^(\s*query_context:\s*\'?)(.*?)(\'?\s*)$', json_text, re.DOTALL)
-            if match:
-                prefix = match.group(1)
-                json_str = match.group(2)
-                suffix = match.group(3)
-                
-                # Clean up the JSON string - remove any trailing quotes that might be part of the JSON
-                if json_str.endswith("'}'"):
-                    json_str = json_str[:-2] + "}"
-                elif json_str.endswith("'}"):
-                    json_str = json_str[:-1] + "}"
-                
-                try:
-                    # Parse and reformat the JSON to ensure consistent formatting
-                    json_obj = json.loads(json_str)
-                    # Deep sort all keys recursively for consistent ordering
-                    json_obj = deep_sort_json(json_obj)
-                    # Use compact formatting for consistency
-                    normalized_json = json.dumps(json_obj, separators=(',', ':'), sort_keys=True)
-                    
-                    # Reconstruct the line with normalized JSON
-                    normalized_line = prefix + normalized_json + suffix
-                    normalized_lines.append(normalized_line)
-                except json.JSONDecodeError:
-                    # If JSON parsing fails, keep the original
-                    normalized_lines.extend(json_lines)
-            else:
-                # If regex doesn't match, keep the original
-                normalized_lines.extend(json_lines)
+    return manifest
+
+
+def fetch_object_states(session, url, resource, uuids):
+    """
+    Fetches only uuid and changed_on of the given objects with batched list calls.
+    Returns {uuid: changed_on_utc} for the objects that exist, or None on API errors.
+    """
+    states = {}
+    uuids = sorted(uuids)
+    for start in range(0, len(uuids), VERIFY_BATCH_SIZE):
+        batch = uuids[start:start + VERIFY_BATCH_SIZE]
+        query = {
+            "columns": ["uuid", "changed_on_utc"],
+            "filters": [{"col": "uuid", "opr": "in", "value": batch}],
+            "page": 0,
+            "page_size": len(batch),
+        }
+        resp = session.get(f"{url}/api/v1/{resource}/?q={quote(rison_dumps(query))}")
+        if resp.status_code != 200:
+            print(f"❌ Failed to fetch {resource} states: {resp.status_code}")
+            return None
+        for item in resp.json().get("result", []):
+            states[str(item.get("uuid"))] = item.get("changed_on_utc")
+    return states
+
+
+def find_existing_uuids(session, url, uuids_by_type):
+    """
+    Returns which of the given uuids ({resource: set(uuids)}) exist on the target,
+    or None on API errors.
+    """
+    existing = set()
+    for resource, uuids in uuids_by_type.items():
+        states = fetch_object_states(session, url, resource, uuids)
+        if states is None:
+            return None
+        existing.update(states)
+    return existing
+
+
+def verify_import(session, url, manifest, resource, before=None):
+    """
+    Compares the target against a bundle manifest. Every uuid must exist after the
+    import, and every root object (of the imported `resource`) in `before`
+    ({uuid: changed_on before the import}) must have a newer changed_on. Bundled
+    non-root objects are only checked for existence: Superset creates them if
+    missing but never overwrites them.
+    Returns (missing, stale): {resource: set(uuids)} absent on the target and the set
+    of root uuids that were not updated, or None on API errors.
+    """
+    missing = {}
+    stale = set()
+    for manifest_resource, uuids in manifest.items():
+        after = fetch_object_states(session, url, manifest_resource, uuids)
+        if after is None:
+            return None
+        absent = set(uuids) - set(after)
+        if absent:
+            missing[manifest_resource] = absent
+        if manifest_resource == resource and before:
+            stale |= {u for u in before if u in after and before[u] == after[u]}
+    return missing, stale
+
+
+def import_zip_verified(session, url, zip_path, resource="dashboard", expect_updated=None):
+    """
+    Imports a zip, then verifies the bundle's objects on the target with batched
+    list calls instead of re-exporting them. The zip is kept until verified.
+    expect_updated holds the uuids whose YAML changed in the repo (see
+    find_changed_root_uuids); the zip's root objects among them must get a newer
+    changed_on from the import, otherwise the change wasn't applied.
+    Returns True if the import succeeded, every object is present and every expected root was updated.
+    """
+    zip_name = os.path.basename(zip_path)
+    manifest = build_bundle_manifest(zip_path)
+
+    # Only roots with a repo change are worth a list call before the import
+    before = None
+    roots = manifest.get(resource, set()) & set(expect_updated or ())
+    if roots:
+        before = fetch_object_states(session, url, resource, roots)
+
+    success, _ = import_zip(session, url, zip_path, resource=resource, delete_on_success=False)
+    if not success:
+        return False
+
+    verified = verify_import(session, url, manifest, resource, before)
+    if verified is None:
+        print(f"❌ Could not verify {zip_name}")
+        return False
+    missing, stale = verified
+    for missing_resource, uuids in missing.items():
+        print(f"❌ {zip_name}: {len(uuids)} {missing_resource}(s) missing on target: {', '.join(sorted(uuids))}")
+    if stale:
+        print(f"❌ {zip_name}: {len(stale)} {resource}(s) changed in the repo but not updated on target: "
+              f"{', '.join(sorted(stale))}")
+    if missing or stale:
+        return False
+
+    total = sum(len(uuids) for uuids in manifest.values())
+    updated = f", {len(roots)} updated" if roots else ""
+    print(f"🔎 Verified {zip_name}: {total} object(s) present on target{updated}")
+    return True
+
+
+def plan_import_waves(group):
+    """
+    Splits jobs of one resource into waves whose zips share no object (e.g. the
+    database every dataset zip bundles). Two concurrent imports creating the same
+    missing uuid would collide, so only zips within a wave may run in parallel.
+    Each zip goes into the wave after the last one using any of its uuids.
+    Returns [[job index, ...], ...] in the order the waves must run.
+    """
+    waves = []
+    last_wave = {}  # uuid -> index of the last wave importing it
+    for i, (zip_path, _) in enumerate(group):
+        uuids = set().union(*build_bundle_manifest(zip_path, tuple(BUNDLE_TYPES.values())).values())
+        wave = max((last_wave[u] for u in uuids if u in last_wave), default=-1) + 1
+        if wave == len(waves):
+            waves.append([])
+        waves[wave].append(i)
+        for u in uuids:
+            last_wave[u] = wave
+    return waves
+
+
+def run_import_jobs(jobs, import_one, workers=1):
+    """
+    Calls import_one(zip_path, resource) for each (zip_path, resource) job.
+    Consecutive jobs of the same resource run up to `workers` at a time, as long
+    as their zips share no object (see plan_import_waves); the next resource only
+    starts once they are done, so datasets still land before the charts and
+    dashboards using them.
+    Returns [(zip_path, resource, result of import_one)] in job order.
+    """
+    results = []
+    for resource, group in itertools.groupby(jobs, key=lambda job: job[1]):
+        group = list(group)
+        if workers > 1 and len(group) > 1:
+            outcomes = [None] * len(group)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                for wave in plan_import_waves(group):
+                    for i, outcome in zip(wave, executor.map(lambda i: import_one(*group[i]), wave)):
+                        outcomes[i] = outcome
         else:
-            normalized_lines.append(line)
-        
-        i += 1
-    
-    return '\n'.join(normalized_lines)
+            outcomes = [import_one(*job) for job in group]
+        results.extend((zip_path, resource, outcome) for (zip_path, _), outcome in zip(group, outcomes))
+    return results
+
+
+def import_zips_verified(session, url, jobs, retries=1, workers=1, expect_updated=None):
+    """
+    Imports (zip_path, resource) jobs in order with post-import verification
+    (expect_updated: see import_zip_verified).
+    Mismatched imports are queued and retried after the pass; zips are only
+    deleted once verified. Returns (verified count, failed zip paths).
+    """
+    verified = 0
+    queue = list(jobs)
+    for attempt in range(retries + 1):
+        if attempt:
+            print(f"\n🔁 Retrying {len(queue)} unverified import(s) (attempt {attempt}/{retries})")
+        retry_queue = []
+        results = run_import_jobs(
+            queue,
+            lambda zip_path, resource: import_zip_verified(
+                session, url, zip_path, resource=resource, expect_updated=expect_updated
+            ),
+            workers
+        )
+        for zip_path, resource, success in results:
+            if success:
+                verified += 1
+                delete_zip(zip_path)
+            else:
+                retry_queue.append((zip_path, resource))
+        queue = retry_queue
+        if not queue:
+            break
+    return verified, [zip_path for zip_path, _ in queue]
 
 
+# ------------------------------
+# YAML Normalization Functions
+# ------------------------------
+
 def normalize_yaml_content(content):
-    """Normalize YAML content to handle line break differences and Superset field changes"""
-    if not content:
-        return content
-    
-    # Remove trailing whitespace from each line
-    lines = content.splitlines()
-    normalized_lines = [line.rstrip() for line in lines]
-    
-    # Remove lines that are default empty fields commonly added by Superset
-    fields_to_remove = [
-        r'^\s*annotation_layers:\s*\[\]\s*$',
-        r'^\s*adhoc_filters:\s*\[\]\s*$', 
-        r'^\s*dashboards:\s*\[\]\s*$',
-        r'^\s*extra_form_data:\s*\{\}\s*$'
-    ]
-    
-    filtered_lines = []
-    for line in normalized_lines:
-        should_remove = False
-        for pattern in fields_to_remove:
-            if re.match(pattern, line):
-                should_remove = True
-                break
-        if not should_remove:
-            filtered_lines.append(line)
-    
-    # Join lines and normalize line endings
-    normalized_content = '\n'.join(filtered_lines)
-    
-    # Normalize JSON formatting in query_context field
-    # This handles cases where Superset exports JSON in different formats (compact vs pretty-printed)
-    normalized_content = normalize_json_in_yaml(normalized_content)
-    
-    # Remove multiple consecutive empty lines (replace with single empty line)
-    normalized_content = re.sub(r'\n\s*\n\s*\n+', '\n\n', normalized_content)
-    
-    # Remove trailing empty lines (but keep one if the file had content)
-    normalized_content = normalized_content.rstrip('\n')
-    
-    # Ensure file ends with single newline if it had any content
-    if normalized_content:
-        normalized_content += '\n'
-    
-    return normalized_content
+    """
+    Normalize YAML content to handle line break differences and Superset field changes.
+    Applies the configured normalization rules (see utils/normalization.py) in one pass,
+    memoized by content hash unless the cache is disabled.
+    """
+    cache = get_normalization_cache()
+    if cache is not None:
+        return cache.normalize(content)
+    return get_normalization_rules().normalize(content)
+
+
+def iter_normalized_yaml_lines(lines):
+    """
+    Streaming version of normalize_yaml_content: consumes an iterable of lines
+    (e.g. an open file) and yields the normalized lines without their newline.
+    "\n".join(...) + "\n" of the output equals normalize_yaml_content() of the same content.
+    """
+    return get_normalization_rules().iter_lines(lines)
+
+
+def normalized_digest(lines):
+    """Returns a sha256 hex digest of the normalized content of an iterable of lines"""
+    digest = hashlib.sha256()
+    for line in iter_normalized_yaml_lines(lines):
+        digest.update(line.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()